@@ -1,23 +1,33 @@
-import cv2
-import easyocr
-import numpy as np
 import os
 import time
 import re
+from lazy_imports import lazy_import
+from video_codec import CaptureSettings, CodecSettings, ThreadedCapture, open_capture, open_writer
+from metrics import timed
+from recognizers import get_recognizer
+
+cv2 = lazy_import('cv2')
 
 class ANPRModule:
     """
     Automatic Number Plate Recognition (ANPR) Module.
     Designed for Indian Number Plates using OpenCV and EasyOCR.
     """
-    def __init__(self, stream_url=0):
+    def __init__(self, stream_url=0, capture_settings=None, codec_settings=None, recognizer=None):
         """
         :param stream_url: IP Camera URL (e.g., 'http://10.158.157.64:4747/video') or 0 for local webcam.
+        :param capture_settings: CaptureSettings (buffer size, decode threads); defaults from env.
+        :param codec_settings: CodecSettings for evidence clips; defaults from env.
+        :param recognizer: 'easyocr' or 'crnn' (see recognizers.py); defaults to ANPR_RECOGNIZER.
         """
         self.stream_url = stream_url
-        # Initialize EasyOCR reader for English
-        # gpu=False ensures it runs on CPU as per common backend requirements
-        self.reader = easyocr.Reader(['en'], gpu=False) 
+        self.capture_settings = capture_settings or CaptureSettings.from_env()
+        self.codec_settings = codec_settings or CodecSettings.from_env()
+        # Where detect_plate() saves the latest crop as evidence; None disables the write
+        self.crop_output = "cropped_plate.jpg"
+        # Plate text recognizer (EasyOCR or the plate CRNN), CPU only; loaded on first OCR
+        self.recognizer_name = recognizer
+        self._reader = None
         
         # Load the pre-trained Haar Cascade for license plates
         self.cascade_path = 'haarcascade_plate.xml'
@@ -27,17 +37,23 @@ class ANPRModule:
         else:
             self.plate_cascade = cv2.CascadeClassifier(self.cascade_path)
         
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = get_recognizer(self.recognizer_name)
+        return self._reader
+
     def connect_camera(self):
         """
         Connects to the stream and returns the VideoCapture object.
         """
         print(f"[PROCESS] Connecting to IP Camera: {self.stream_url}")
-        cap = cv2.VideoCapture(self.stream_url)
+        cap = open_capture(self.stream_url, self.capture_settings)
         
         # Give some time for reconnection
         if not cap.isOpened():
             time.sleep(2)
-            cap = cv2.VideoCapture(self.stream_url)
+            cap = open_capture(self.stream_url, self.capture_settings)
             
         if not cap.isOpened():
             print("[CRITICAL] Failed to establish connection with IP Camera.")
@@ -50,10 +66,11 @@ class ANPRModule:
         """
         Reads one frame from the stream and saves it as an image.
         """
-        # Flush buffer to get the freshest frame
-        for _ in range(5): cap.grab()
-        
-        ret, frame = cap.read()
+        with timed('capture'):
+            # Flush buffer to get the freshest frame
+            for _ in range(5): cap.grab()
+            
+            ret, frame = cap.read()
         if ret:
             cv2.imwrite(filename, frame)
             print(f"[FILE] Snapshot captured and saved: {filename}")
@@ -70,22 +87,30 @@ class ANPRModule:
         
         frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = 20.0 # Standard for many IP cams; adjust if needed
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_file, fourcc, fps, (frame_width, frame_height))
+        # Encoder (codec, threads, ffmpeg pipe vs OpenCV) comes from CodecSettings
+        print(f"[PROCESS] Encoder: {self.codec_settings.describe()}")
+        out = open_writer(output_file, (frame_width, frame_height), self.codec_settings)
+
+        # Evidence must not lose frames: the decode thread waits for the encoder instead of dropping
+        lossless = isinstance(cap, ThreadedCapture)
+        if lossless:
+            cap.drop_oldest = False
 
         start_time = time.time()
         frames_captured = 0
-        while (time.time() - start_time) < duration:
-            ret, frame = cap.read()
-            if ret:
-                out.write(frame)
-                frames_captured += 1
-            else:
-                break
-        
-        out.release()
+        try:
+            while (time.time() - start_time) < duration:
+                ret, frame = cap.read()
+                if ret:
+                    out.write(frame)
+                    frames_captured += 1
+                else:
+                    break
+        finally:
+            if lossless:
+                cap.drop_oldest = True
+            out.release()
         print(f"[FILE] Evidence video saved: {output_file} ({frames_captured} frames captured)")
 
     def detect_plate(self, frame):
@@ -95,20 +120,23 @@ class ANPRModule:
         if self.plate_cascade is None:
             return None
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Parameters tuned for Indian plates (scaleFactor, minNeighbors)
-        plates = self.plate_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(30, 30))
+        with timed('detect'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # Parameters tuned for Indian plates (scaleFactor, minNeighbors)
+            plates = self.plate_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(30, 30))
         
         if len(plates) > 0:
             # Sort by area and pick largest detection
             (x, y, w, h) = sorted(plates, key=lambda b: b[2] * b[3], reverse=True)[0]
             
-            # Crop with safe margins
-            plate_crop = frame[max(0, y-10):min(frame.shape[0], y+h+10), 
-                               max(0, x-10):min(frame.shape[1], x+w+10)]
-                               
-            cv2.imwrite("cropped_plate.jpg", plate_crop)
+            with timed('crop'):
+                # Crop with safe margins
+                plate_crop = frame[max(0, y-10):min(frame.shape[0], y+h+10), 
+                                   max(0, x-10):min(frame.shape[1], x+w+10)]
+                                   
+                if self.crop_output:
+                    cv2.imwrite(self.crop_output, plate_crop)
             print("[ANALYTICS] License plate region localized.")
             return plate_crop
         
@@ -122,7 +150,8 @@ class ANPRModule:
             return "NO_PLATE_IMG"
             
         print("[OCR] Reading characters from localized region...")
-        results = self.reader.readtext(plate_image)
+        with timed('ocr'):
+            results = self.reader.readtext(plate_image)
         
         detected_texts = []
         for (_, text, _) in results:
@@ -1,11 +1,21 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, send_file, send_from_directory, g, Response
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
-from models import db, User, Admin, Vehicle, Violation, Camera, Payment, SupportTicket, bcrypt
+from models import db, User, Admin, Vehicle, Violation, Camera, Payment, SupportTicket, CameraSegment, ExportJob, SIGHTING_STATUS, bcrypt, upgrade_schema
+import media
+import storage
+import metrics
+import events
+import relay
+import plate_search
+import export
+import response_cache
+import time
 import os
 import uuid
-from datetime import datetime
+import json
+from datetime import datetime, timedelta, timezone
 
 # Initialize
 app = Flask(__name__)
@@ -13,12 +23,15 @@ app.config['SECRET_KEY'] = 'dev-secret-key-123'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///echallan.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['PROCESSED_FOLDER'] = 'processed_uploads'
+app.config['MEDIA_MAX_AGE'] = 7 * 24 * 3600 # Evidence files are never rewritten in place
+app.config['CAMERA_STREAM_TEMPLATE'] = 'http://{ip}:4747/video' # used when Camera.ip_address is a bare IP
 
 # Ensure upload directory exists
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
-CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization", "X-User-Id"])
+CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization", "X-User-Id"], expose_headers=["X-Event-Cursor", "ETag", "X-Cache"])
 db.init_app(app)
 bcrypt.init_app(app)
 
@@ -27,6 +40,32 @@ with app.app_context():
     if not os.path.exists('instance'):
         os.makedirs('instance')
     db.create_all()
+    upgrade_schema()
+    plate_search.ensure_index(db)
+    metrics.instrument_engine(db.engine)
+
+# Single change-feed reader shared by every dashboard stream (started on first subscriber)
+broadcaster = events.EventBroadcaster(app)
+# One decode per camera, fanned out to every preview viewer
+relays = relay.RelayManager()
+# Bulk exports run one at a time off the request thread
+exports = export.ExportRunner(app)
+with app.app_context():
+    exports.recover()
+# Dashboard reads, keyed on data versions (RESPONSE_CACHE=memory|sqlite|off)
+cache = response_cache.ResponseCache.from_env()
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    if hasattr(g, 'request_start'):
+        endpoint = request.endpoint or 'unknown'
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
 
 # ============================
 # API ROUTES
@@ -36,6 +75,11 @@ with app.app_context():
 def home():
     return jsonify({"message": "eChallan API is running", "status": "active"})
 
+@app.route('/metrics')
+def prometheus_metrics():
+    # Combined view: this API process plus worker/compactor snapshots
+    return Response(metrics.render(process=f"api-{os.getpid()}"), mimetype='text/plain; version=0.0.4')
+
 # --- AUTHENTICATION ---
 
 @app.route('/api/auth/register-user', methods=['POST'])
@@ -56,6 +100,7 @@ def register_user():
             registration_date=datetime.now().date()
         )
         db.session.add(mock_vehicle)
+        response_cache.bump_version('vehicles')
         db.session.commit()
 
     if User.query.filter_by(email=data['email']).first():
@@ -140,24 +185,159 @@ def upload_violation():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    # Process save
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    # Optional metadata from the edge device: which camera, and when the frame was taken
+    camera = None
+    if request.form.get('camera_id'):
+        try:
+            camera = Camera.query.get(int(request.form['camera_id']))
+        except ValueError:
+            camera = None
+        if not camera:
+            return jsonify({"error": "Unknown camera_id"}), 400
+    priority_class = request.form.get('source', 'live')
+    if priority_class not in ('live', 'reupload', 'backfill'):
+        return jsonify({"error": "source must be live, reupload or backfill"}), 400
+    captured_at = None
+    if request.form.get('captured_at'):
+        try:
+            captured_at = datetime.fromisoformat(request.form['captured_at'])
+        except ValueError:
+            return jsonify({"error": "captured_at must be ISO 8601 (UTC)"}), 400
+        if captured_at.tzinfo is not None:
+            # Stored as naive UTC; an offset like +05:30 must shift the time, not be dropped
+            captured_at = captured_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # Process save (content-addressed: identical bytes are stored once)
+    ext = os.path.splitext(file.filename)[1]
+    ref, digest, size, created = storage.get_blob_store().put_stream(file.stream, ext)
+
+    if not created:
+        # Retransmission of an image we already have -> return the existing record
+        existing = Violation.query.filter_by(image_path=ref).first()
+        if existing:
+            return jsonify({"message": "File already uploaded", "id": existing.id, "duplicate": True}), 200
+
+    storage.record_blob(db.session, ref, digest, size)
 
     # Create Initial Record
     new_violation = Violation(
-        image_path=filepath,
-        location="Camera 1 - Main Road", # Mock location for now
+        image_path=ref,
+        location=camera.location if camera else "Camera 1 - Main Road", # Mock location when no camera given
         violation_type="Processing...",
-        status="pending"
+        status="pending",
+        camera_id=camera.id if camera else None,
+        captured_at=captured_at,
+        priority_class=priority_class
     )
     
     db.session.add(new_violation)
+    events.record_event(new_violation, 'created')
     db.session.commit()
 
     return jsonify({"message": "File uploaded successfully", "id": new_violation.id}), 201
 
+# --- EVIDENCE MEDIA ---
+
+def media_url(violation_id, kind, size):
+    return f"/api/media/violation/{violation_id}/{kind}/{size}"
+
+def _immutable(response):
+    # private: evidence is per-owner, so shared caches must not keep it
+    response.headers['Cache-Control'] = f"private, max-age={app.config['MEDIA_MAX_AGE']}, immutable"
+    return response
+
+def _violations_using(path):
+    return Violation.query.filter(
+        (Violation.image_path == path) |
+        (Violation.video_path == path) |
+        (Violation.cropped_plate_path == path)
+    ).all()
+
+def can_view_evidence(violations):
+    """
+    Admins see all evidence, users only their own vehicle's. <img>/<video>
+    cannot send headers, so the token and user id may also come as query
+    parameters (?token=...&user_id=...).
+    """
+    token = request.headers.get('Authorization') or request.args.get('token', '')
+    if 'fake-jwt-token-admin' in token:
+        return True
+    if 'fake-jwt-token-user' not in token:
+        return False
+    try:
+        user = User.query.get(int(request.headers.get('X-User-Id') or request.args.get('user_id', '')))
+    except ValueError:
+        return False
+    return bool(user) and any(v.vehicle_number and v.vehicle_number == user.vehicle_number for v in violations)
+
+def _send_media(path):
+    # conditional=True gives us ETag / If-None-Match / Range handling from Werkzeug
+    return _immutable(send_file(os.path.abspath(path), conditional=True, etag=True, max_age=app.config['MEDIA_MAX_AGE']))
+
+@app.route('/uploads/<path:filename>', methods=['GET'])
+def serve_upload(filename):
+    if not can_view_evidence(_violations_using(f"{app.config['UPLOAD_FOLDER']}/{filename}")):
+        return jsonify({"error": "Unauthorized"}), 401
+    return _immutable(send_from_directory(os.path.abspath(app.config['UPLOAD_FOLDER']), filename, conditional=True, max_age=app.config['MEDIA_MAX_AGE']))
+
+@app.route('/processed_uploads/<path:filename>', methods=['GET'])
+def serve_processed_upload(filename):
+    if not can_view_evidence(_violations_using(f"{app.config['PROCESSED_FOLDER']}/{filename}")):
+        return jsonify({"error": "Unauthorized"}), 401
+    return _immutable(send_from_directory(os.path.abspath(app.config['PROCESSED_FOLDER']), filename, conditional=True, max_age=app.config['MEDIA_MAX_AGE']))
+
+@app.route('/blobs/<path:ref>', methods=['GET'])
+def serve_blob(ref):
+    ref = f"{storage.BLOB_PREFIX}/{ref}"
+    if not storage.is_valid_ref(ref):
+        return jsonify({"error": "Media not available"}), 404
+    if not can_view_evidence(_violations_using(ref)):
+        return jsonify({"error": "Unauthorized"}), 401
+    path = storage.resolve_path(ref)
+    if not os.path.exists(path):
+        return jsonify({"error": "Media not available"}), 404
+    return _send_media(path)
+
+@app.route('/api/media/violation/<int:id>/<kind>/<size>', methods=['GET'])
+def violation_media(id, kind, size):
+    v = Violation.query.get(id)
+    if not v:
+        return jsonify({"error": "Challan not found"}), 404
+    if not can_view_evidence([v]):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    sources = {
+        'image': (v.image_path, False),
+        'plate': (v.cropped_plate_path, False),
+        'video': (v.video_path, True),
+    }
+    if kind not in sources or size not in media.THUMB_SIZES:
+        return jsonify({"error": "Unknown media variant"}), 400
+
+    fmt = request.args.get('format')
+    if fmt not in media.THUMB_FORMATS:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+
+    source_path, is_video = sources[kind]
+    path = media.ensure_thumbnail(storage.resolve_path(source_path), size, fmt, is_video=is_video)
+    if not path:
+        return jsonify({"error": "Media not available"}), 404
+
+    response = _send_media(path)
+    response.headers['Vary'] = 'Accept'
+    return response
+
+@app.route('/api/media/violation/<int:id>/video', methods=['GET'])
+def violation_video(id):
+    v = Violation.query.get(id)
+    if v and not can_view_evidence([v]):
+        return jsonify({"error": "Unauthorized"}), 401
+    video_path = storage.resolve_path(v.video_path) if v and v.video_path else None
+    if not video_path or not os.path.exists(video_path):
+        return jsonify({"error": "Video not available"}), 404
+    # Range requests let the browser seek without downloading the whole clip
+    return _send_media(video_path)
+
 # --- USER DASHBOARD APIS ---
 
 def get_current_user():
@@ -175,13 +355,19 @@ def get_current_user():
             return None
     return None
 
+def user_principal():
+    user = get_current_user()
+    return f"user:{user.id}:{user.vehicle_number}" if user else None
+
 @app.route('/api/user/challans', methods=['GET'])
+@cache.cached(ttl=120, depends=('violations',), principal=user_principal)
 def get_user_challans():
     user = get_current_user()
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
     
-    challans = Violation.query.filter_by(vehicle_number=user.vehicle_number).order_by(Violation.timestamp.desc()).all()
+    challans = Violation.query.filter(Violation.vehicle_number == user.vehicle_number,
+                                      Violation.status != SIGHTING_STATUS).order_by(Violation.timestamp.desc()).all()
     result = []
     for c in challans:
         result.append({
@@ -194,7 +380,9 @@ def get_user_challans():
             "location": c.location,
             "image": c.image_path,
             "video": c.video_path,
-            "plate_crop": c.cropped_plate_path
+            "plate_crop": c.cropped_plate_path,
+            "thumbnail": media_url(c.id, 'image', 'sm'),
+            "video_poster": media_url(c.id, 'video', 'md') if c.video_path else None
         })
     return jsonify(result), 200
 
@@ -289,7 +477,7 @@ def pay_challan():
     challan_id = data.get('challan_id')
     challan = Violation.query.get(challan_id)
     
-    if not challan or challan.vehicle_number != user.vehicle_number:
+    if not challan or challan.vehicle_number != user.vehicle_number or challan.status == SIGHTING_STATUS:
         return jsonify({"error": "Challan not found"}), 404
     
     if challan.status == 'paid':
@@ -309,6 +497,7 @@ def pay_challan():
     
     try:
         db.session.add(new_payment)
+        events.record_event(challan, 'paid')
         db.session.commit()
         return jsonify({"message": "Payment successful", "transaction_ref": challan.transaction_id}), 200
     except Exception as e:
@@ -321,28 +510,99 @@ def is_admin():
     auth_header = request.headers.get('Authorization')
     return auth_header and 'fake-jwt-token-admin' in auth_header
 
+def admin_principal():
+    # Admin payloads don't differ between admins
+    return 'admin' if is_admin() else None
+
 @app.route('/api/admin/challans', methods=['GET'])
 def admin_get_challans():
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
     
-    violations = Violation.query.order_by(Violation.timestamp.desc()).all()
+    # Read the cursor first: anything committed after this point arrives via /api/admin/events
+    cursor = events.current_cursor()
+    violations = Violation.query.filter(Violation.status != SIGHTING_STATUS).order_by(Violation.timestamp.desc()).all()
     result = []
     for v in violations:
         # Try to find owner name from Vehicle table
         vehicle = Vehicle.query.get(v.vehicle_number) if v.vehicle_number else None
-        result.append({
-            "id": v.id,
-            "vehicle_number": v.vehicle_number or "Scanning...",
-            "owner_name": vehicle.owner_name if vehicle else "Unknown",
-            "type": v.violation_type,
-            "amount": v.fine_amount,
-            "status": v.status,
-            "timestamp": v.timestamp.strftime("%Y-%m-%d %H:%M")
-        })
-    return jsonify(result), 200
+        result.append(events.violation_row(v, vehicle.owner_name if vehicle else "Unknown"))
+    response = jsonify(result)
+    response.headers['X-Event-Cursor'] = str(cursor)
+    return response, 200
+
+@app.route('/api/admin/search', methods=['GET'])
+def admin_search_plates():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    q = request.args.get('q', '')
+    scope = request.args.get('scope', 'violations')
+    fuzzy = request.args.get('fuzzy', '0') in ('1', 'true')
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 25))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    if scope not in plate_search.INDEXES:
+        return jsonify({"error": "scope must be 'violations' or 'vehicles'"}), 400
+    if plate_search.parse_query(q) is None:
+        return jsonify({"error": "Query must contain at least one letter or digit"}), 400
+
+    found = plate_search.search(db, q, scope=scope, fuzzy=fuzzy, page=page, per_page=per_page)
+    ids = [rowid for rowid, _ in found["rows"]]
+
+    if scope == 'violations':
+        by_id = {v.id: v for v in Violation.query.filter(Violation.id.in_(ids)).all()} if ids else {}
+        owners = dict(db.session.query(Vehicle.vehicle_number, Vehicle.owner_name)
+                      .filter(Vehicle.vehicle_number.in_({v.vehicle_number for v in by_id.values()})).all()) if by_id else {}
+        results = [events.violation_row(by_id[i], owners.get(by_id[i].vehicle_number, "Unknown"))
+                   for i in ids if i in by_id]
+    else:
+        plates = [plate for _, plate in found["rows"]]
+        vehicles = {v.vehicle_number: v for v in Vehicle.query.filter(Vehicle.vehicle_number.in_(plates)).all()} if plates else {}
+        results = [{
+            "vehicle_number": v.vehicle_number,
+            "owner_name": v.owner_name,
+            "vehicle_model": v.vehicle_model,
+            "vehicle_type": v.vehicle_type
+        } for v in (vehicles.get(p) for p in plates) if v]
+
+    return jsonify({
+        "query": q,
+        "fuzzy": fuzzy,
+        "page": page,
+        "per_page": per_page,
+        "has_more": found["has_more"],
+        "results": results
+    }), 200
+
+@app.route('/api/admin/events', methods=['GET'])
+def admin_violation_events():
+    # EventSource cannot send headers, so the token may also come as a query parameter
+    token = request.args.get('token', '')
+    if not is_admin() and 'fake-jwt-token-admin' not in token:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    try:
+        cursor = int(cursor) if cursor is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    broadcaster.start()
+    if cursor is None:
+        # No snapshot yet: start from "now"
+        cursor = broadcaster.last_id
+    backlog = broadcaster.backlog(cursor)
+
+    response = Response(broadcaster.stream(cursor, backlog), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # disable proxy buffering (nginx)
+    return response
 
 @app.route('/api/admin/challan/<int:id>', methods=['GET'])
+@cache.cached(ttl=600, depends=('violations', 'vehicles'), principal=admin_principal)
 def admin_get_challan_detail(id):
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -365,31 +625,38 @@ def admin_get_challan_detail(id):
         "image": v.image_path,
         "video": v.video_path,
         "plate_crop": v.cropped_plate_path,
+        "thumbnail": media_url(v.id, 'image', 'md'),
+        "plate_thumbnail": media_url(v.id, 'plate', 'sm') if v.cropped_plate_path else None,
+        "video_poster": media_url(v.id, 'video', 'md') if v.video_path else None,
         "payment_date": v.payment_date.strftime("%Y-%m-%d %H:%M") if v.payment_date else None,
+        "camera_id": v.camera_id,
+        "evidence": json.loads(v.evidence) if v.evidence else None,
         "transaction_id": v.transaction_id
     }), 200
 
 @app.route('/api/admin/statistics', methods=['GET'])
+@cache.cached(ttl=30, depends=('violations', 'vehicles', 'cameras'), principal=admin_principal) # "today" moves with the clock
 def get_admin_stats():
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
     
-    total_violations = Violation.query.count()
+    challans = Violation.query.filter(Violation.status != SIGHTING_STATUS) # section-camera sightings aren't challans
+    total_violations = challans.count()
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_violations = Violation.query.filter(Violation.timestamp >= today_start).count()
+    today_violations = challans.filter(Violation.timestamp >= today_start).count()
     paid_challans = Violation.query.filter_by(status='paid').count()
     unpaid_challans = Violation.query.filter_by(status='pending').count()
     active_cameras = Camera.query.filter_by(status='active').count()
     
     # Simple chart data: Violations in last 7 days
-    from sqlalchemy import func, timedelta
+    from sqlalchemy import func
     chart_data = []
     for i in range(6, -1, -1):
         day = (datetime.now() - timedelta(days=i)).date()
-        count = Violation.query.filter(func.date(Violation.timestamp) == day).count()
+        count = challans.filter(func.date(Violation.timestamp) == day).count()
         chart_data.append({"date": day.strftime("%b %d"), "count": count})
         
-    vehicle_types = db.session.query(Vehicle.vehicle_type, func.count(Violation.id)).join(Violation, Violation.vehicle_number == Vehicle.vehicle_number).group_by(Vehicle.vehicle_type).all()
+    vehicle_types = db.session.query(Vehicle.vehicle_type, func.count(Violation.id)).join(Violation, Violation.vehicle_number == Vehicle.vehicle_number).filter(Violation.status != SIGHTING_STATUS).group_by(Vehicle.vehicle_type).all()
     type_stats = [{"type": t, "count": c} for t, c in vehicle_types]
 
     return jsonify({
@@ -403,6 +670,7 @@ def get_admin_stats():
     }), 200
 
 @app.route('/api/admin/cameras', methods=['GET'])
+@cache.cached(ttl=300, depends=('cameras',), principal=admin_principal)
 def admin_get_cameras():
     if not is_admin():
         return jsonify({"error": "Unauthorized"}), 401
@@ -415,6 +683,7 @@ def admin_get_cameras():
         cam3 = Camera(location="Highway Exit B", status="offline")
         cam4 = Camera(location="Traffic Square A", status="active")
         db.session.add_all([cam1, cam2, cam3, cam4])
+        response_cache.bump_version('cameras')
         db.session.commit()
         cameras = Camera.query.all()
 
@@ -429,6 +698,117 @@ def admin_get_cameras():
         })
     return jsonify(result[:6]), 200 # Limited to 6 as requested
 
+@app.route('/api/admin/segments', methods=['GET', 'POST'])
+def admin_segments():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.method == 'POST':
+        data = request.json
+        upstream = Camera.query.get(data.get('upstream_camera_id'))
+        downstream = Camera.query.get(data.get('downstream_camera_id'))
+        if not upstream or not downstream or upstream.id == downstream.id:
+            return jsonify({"error": "Two different existing cameras are required"}), 400
+        try:
+            distance_m = float(data['distance_m'])
+            speed_limit = float(data['speed_limit_kmph'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "distance_m and speed_limit_kmph are required"}), 400
+        if distance_m <= 0 or speed_limit <= 0:
+            return jsonify({"error": "distance_m and speed_limit_kmph must be positive"}), 400
+
+        segment = CameraSegment(upstream_camera_id=upstream.id, downstream_camera_id=downstream.id,
+                                distance_m=distance_m, speed_limit_kmph=speed_limit)
+        try:
+            db.session.add(segment)
+            db.session.commit()
+            # The worker picks new segments up within a minute
+            return jsonify({"message": "Segment created", "id": segment.id}), 201
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
+
+    segments = CameraSegment.query.all()
+    return jsonify([{
+        "id": s.id,
+        "upstream_camera_id": s.upstream_camera_id,
+        "downstream_camera_id": s.downstream_camera_id,
+        "distance_m": s.distance_m,
+        "speed_limit_kmph": s.speed_limit_kmph,
+        "active": s.active
+    } for s in segments]), 200
+
+def export_job_json(job):
+    return {
+        "id": job.id,
+        "dataset": job.dataset,
+        "format": job.format,
+        "gzip": job.compress,
+        "filters": json.loads(job.filters) if job.filters else {},
+        "status": job.status,
+        "rows": job.rows,
+        "size": job.size,
+        "error": job.error,
+        "created_at": job.created_at.strftime("%Y-%m-%d %H:%M:%S") if job.created_at else None,
+        "finished_at": job.finished_at.strftime("%Y-%m-%d %H:%M:%S") if job.finished_at else None,
+        "download_url": f"/api/admin/exports/{job.id}/download" if job.status == 'done' else None,
+    }
+
+@app.route('/api/admin/exports', methods=['GET', 'POST'])
+def admin_exports():
+    if not is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.method == 'POST':
+        data = request.json or {}
+        dataset = data.get('dataset')
+        fmt = data.get('format', 'csv')
+        if dataset not in export.DATASETS or fmt not in export.FORMATS:
+            return jsonify({"error": f"dataset must be one of {sorted(export.DATASETS)}, format one of {list(export.FORMATS)}"}), 400
+        status = data.get('status')
+        if isinstance(status, str):
+            status = [status]
+        try:
+            export.parse_date(data.get('since'))
+            export.parse_date(data.get('until'))
+        except ValueError:
+            return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+        job = exports.submit(dataset, fmt, compress=bool(data.get('gzip')), since=data.get('since'),
+                             until=data.get('until'), status=status)
+        response = jsonify(export_job_json(job))
+        response.headers['Location'] = f"/api/admin/exports/{job.id}"
+        return response, 202
+
+    jobs = ExportJob.query.order_by(ExportJob.created_at.desc()).limit(50).all()
+    return jsonify([export_job_json(j) for j in jobs]), 200
+
+@app.route('/api/admin/exports/<job_id>', methods=['GET'])
+def admin_export_status(job_id):
+    if not is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    job = db.session.get(ExportJob, job_id)
+    if not job:
+        return jsonify({"error": "Export not found"}), 404
+    return jsonify(export_job_json(job)), 200
+
+@app.route('/api/admin/exports/<job_id>/download', methods=['GET'])
+def admin_export_download(job_id):
+    # Plain links cannot send headers, so the token may also come as a query parameter
+    token = request.args.get('token', '')
+    if not is_admin() and 'fake-jwt-token-admin' not in token:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = db.session.get(ExportJob, job_id)
+    if not job or job.status != 'done':
+        return jsonify({"error": "Export not ready"}), 404
+    path = os.path.abspath(exports.path_for(job))
+    if not os.path.exists(path):
+        return jsonify({"error": "Export file has expired"}), 410
+    mimetype = 'application/vnd.apache.parquet' if job.format == 'parquet' else \
+        ('application/gzip' if job.compress else 'text/csv')
+    # send_file streams from disk in blocks
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=job.file_name, conditional=True)
+
 @app.route('/api/admin/camera/<int:id>/stream', methods=['GET'])
 def get_camera_stream(id):
     if not is_admin():
@@ -438,12 +818,32 @@ def get_camera_stream(id):
     if not cam:
         return jsonify({"error": "Camera not found"}), 404
         
+    source = relay.camera_source(cam.ip_address, app.config['CAMERA_STREAM_TEMPLATE'])
     return jsonify({
         "id": cam.id,
         "location": cam.location,
         "status": cam.status,
-        "stream_url": f"http://mock-stream-server.io/live/cam_{cam.id}"
+        "stream_url": f"{request.host_url.rstrip('/')}/api/admin/camera/{cam.id}/live.mjpg" if source is not None else None,
+        "relay": relays.stats(cam.id)
     }), 200
 
+@app.route('/api/admin/camera/<int:id>/live.mjpg', methods=['GET'])
+def camera_live_preview(id):
+    # <img> tags cannot send headers, so the token may also come as a query parameter
+    if not is_admin() and 'fake-jwt-token-admin' not in request.args.get('token', ''):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    cam = Camera.query.get(id)
+    if not cam:
+        return jsonify({"error": "Camera not found"}), 404
+    source = relay.camera_source(cam.ip_address, app.config['CAMERA_STREAM_TEMPLATE'])
+    if source is None:
+        return jsonify({"error": "No stream configured for this camera"}), 404
+
+    camera_relay = relays.get(cam.id, source)
+    response = Response(camera_relay.frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,250 @@
+"""
+Re-runs historical violations through the current OCR pipeline.
+
+Selects rows by status, date range, camera and confidence, OCRs them on a
+process pool and writes a CSV of every row whose plate or classification
+changed. Progress is checkpointed after each chunk, so an interrupted run
+picks up where it stopped when started again with the same filters. Paid
+challans are never selected, and a row that is paid or otherwise changes
+while its OCR runs is left alone.
+
+    python backfill.py --status needs_review error --since 2025-01-01
+    python backfill.py --camera 3 --max-confidence 0.5 --dry-run --report diff.csv
+
+Children run at low CPU priority with one OpenCV thread each, and the run
+pauses between chunks while the live worker has a backlog.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from models import Violation, db, create_app
+
+# Paid challans are settled; a re-read must never turn them back into open ones
+NEVER_RECLASSIFY = ('paid',)
+
+CHUNK_SIZE = 64
+NICENESS = 10
+LIVE_BACKLOG_LIMIT = 20     # pause while more live jobs than this are pending
+LIVE_BACKLOG_WAIT = 5       # seconds between backlog checks while paused
+REPORT_FIELDS = ('id', 'camera_id', 'captured_at', 'old_plate', 'new_plate',
+                 'old_status', 'new_status', 'old_type', 'new_type')
+
+_app = None
+_reader = None
+
+
+def _init_child():
+    """Per-process setup: low priority, single-threaded kernels, one OCR reader."""
+    global _app, _reader
+    try:
+        os.nice(NICENESS)
+    except (AttributeError, OSError):
+        pass
+    import cv2
+    from recognizers import get_recognizer
+    cv2.setNumThreads(1)
+    os.environ.setdefault('PREPROCESS_THREADS', '1')
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _app = create_app()
+    _reader = get_recognizer()
+
+
+def _read_plate(violation_id, image_path):
+    """Runs in a child: returns (violation_id, detected_texts or None on failure)."""
+    from worker import extract_plate_text
+    with _app.app_context():
+        try:
+            return violation_id, extract_plate_text(image_path, _reader)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[BACKFILL] OCR failed for {violation_id}: {e}")
+            return violation_id, None
+
+
+def build_query(args):
+    query = Violation.query.filter(Violation.image_path.isnot(None), Violation.status.notin_(NEVER_RECLASSIFY))
+    if args.status:
+        query = query.filter(Violation.status.in_(args.status))
+    seen_at = db.func.coalesce(Violation.captured_at, Violation.timestamp)
+    if args.since:
+        query = query.filter(seen_at >= datetime.strptime(args.since, "%Y-%m-%d"))
+    if args.until:
+        query = query.filter(seen_at < datetime.strptime(args.until, "%Y-%m-%d") + timedelta(days=1))
+    if args.camera:
+        query = query.filter(Violation.camera_id.in_(args.camera))
+    if args.max_confidence is not None:
+        query = query.filter((Violation.confidence_score < args.max_confidence) |
+                             Violation.confidence_score.is_(None))
+    return query
+
+
+def filter_key(args):
+    """Identifies a selection so a checkpoint is never resumed with different filters."""
+    selection = {k: getattr(args, k) for k in ('status', 'since', 'until', 'camera', 'max_confidence', 'dry_run')}
+    return hashlib.sha1(json.dumps(selection, sort_keys=True).encode()).hexdigest()
+
+
+def load_checkpoint(path, key):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('filter') != key:
+        raise SystemExit(f"{path} belongs to a run with different filters; use --restart to discard it")
+    return state['last_id']
+
+
+def save_checkpoint(path, key, last_id, totals):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump({"filter": key, "last_id": last_id, "totals": totals,
+                   "updated_at": datetime.utcnow().isoformat()}, f)
+    os.replace(tmp, path) # never leave a half-written checkpoint behind
+
+
+def live_backlog():
+    return Violation.query.filter(
+        (Violation.status == 'pending') | (Violation.violation_type == 'Processing...'),
+        db.func.coalesce(Violation.priority_class, 'live') == 'live'
+    ).count()
+
+
+def apply_read(violation, detected_texts):
+    """
+    Re-classifies one row from a fresh read. Other rows are re-matched even
+    when the read is unchanged, since a vehicle registered after the first
+    pass turns a needs_review row into a challan. Section-speed rows keep
+    their measurement (pairing needs a time-ordered replay) and go to review
+    when the plate changes.
+    """
+    from worker import match_plate, classify_flagged
+    final_plate, matched_vehicle = match_plate(detected_texts)
+    section_row = violation.evidence is not None or violation.violation_type == "Sighting"
+    if section_row:
+        if final_plate != violation.vehicle_number:
+            violation.vehicle_number = final_plate
+            violation.status = "needs_review"
+        return None
+    violation.vehicle_number = final_plate
+    classify_flagged(violation, final_plate, matched_vehicle)
+    return matched_vehicle
+
+
+def run(args):
+    from events import record_event
+    from notifications import enqueue_for_violation
+    app = create_app()
+    key = filter_key(args)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    report_exists = os.path.exists(args.report) and not args.restart
+
+    with app.app_context():
+        last_id = load_checkpoint(args.checkpoint, key)
+        query = build_query(args)
+        remaining = query.filter(Violation.id > last_id).count()
+    if last_id:
+        print(f"[BACKFILL] Resuming after violation {last_id}")
+    print(f"[BACKFILL] {remaining} violations to re-process on {args.workers} workers")
+
+    totals = {"processed": 0, "changed": 0, "failed": 0, "skipped": 0}
+    started = time.time()
+    with open(args.report, 'a' if report_exists else 'w', newline='') as report_file, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_child) as pool:
+        report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+        if not report_exists:
+            report.writeheader()
+
+        while True:
+            with app.app_context():
+                while live_backlog() > LIVE_BACKLOG_LIMIT:
+                    print("[BACKFILL] Live worker is behind, pausing")
+                    time.sleep(LIVE_BACKLOG_WAIT)
+
+                chunk = build_query(args).filter(Violation.id > last_id) \
+                    .order_by(Violation.id).limit(CHUNK_SIZE) \
+                    .with_entities(Violation.id, Violation.image_path, Violation.vehicle_number,
+                                   Violation.status, Violation.violation_type).all()
+            if not chunk:
+                break
+
+            ids, paths = [row[0] for row in chunk], [row[1] for row in chunk]
+            selected = {row[0]: tuple(row[2:]) for row in chunk}
+            reads = dict(pool.map(_read_plate, ids, paths))
+
+            with app.app_context():
+                # Reload through the same filters: a row paid, finished by the live
+                # worker or otherwise changed while OCR ran is left as it now is
+                for violation in build_query(args).filter(Violation.id.in_(reads)).order_by(Violation.id):
+                    detected_texts = reads[violation.id]
+                    if detected_texts is None:
+                        totals["failed"] += 1
+                        continue
+                    before = (violation.vehicle_number, violation.status, violation.violation_type)
+                    if before != selected[violation.id]:
+                        totals["skipped"] += 1
+                        continue
+                    matched_vehicle = apply_read(violation, detected_texts)
+                    totals["processed"] += 1
+                    if (violation.vehicle_number, violation.status, violation.violation_type) == before:
+                        continue
+                    totals["changed"] += 1
+                    seen_at = violation.captured_at or violation.timestamp
+                    report.writerow({
+                        "id": violation.id, "camera_id": violation.camera_id,
+                        "captured_at": seen_at.isoformat() if seen_at else "",
+                        "old_plate": before[0], "new_plate": violation.vehicle_number,
+                        "old_status": before[1], "new_status": violation.status,
+                        "old_type": before[2], "new_type": violation.violation_type,
+                    })
+                    if not args.dry_run:
+                        record_event(violation, violation.status)
+                        if violation.status == "processed":
+                            enqueue_for_violation(violation, matched_vehicle)
+                if args.dry_run:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+
+            report_file.flush()
+            last_id = chunk[-1][0]
+            save_checkpoint(args.checkpoint, key, last_id, totals)
+            rate = totals["processed"] / max(time.time() - started, 1e-6)
+            print(f"[BACKFILL] up to id {last_id}: {totals['processed']} done, {totals['changed']} changed, "
+                  f"{totals['failed']} failed, {totals['skipped']} changed meanwhile ({rate:.1f}/s)")
+
+    print(f"[BACKFILL] Finished: {totals}. Diff report: {args.report}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run OCR over existing violations")
+    parser.add_argument('--status', nargs='+', default=['needs_review', 'error'],
+                        help="Statuses to re-process (default: needs_review error)")
+    parser.add_argument('--since', help="First capture date, YYYY-MM-DD")
+    parser.add_argument('--until', help="Last capture date (inclusive), YYYY-MM-DD")
+    parser.add_argument('--camera', type=int, nargs='+', help="Camera ids")
+    parser.add_argument('--max-confidence', type=float, help="Only rows with confidence_score below this")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--checkpoint', default='backfill_checkpoint.json')
+    parser.add_argument('--report', default='backfill_diff.csv')
+    parser.add_argument('--dry-run', action='store_true', help="Write the diff report without updating rows")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and report")
+    args = parser.parse_args()
+    if set(args.status or ()) & set(NEVER_RECLASSIFY):
+        parser.error("paid challans are never re-processed")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Offline replay harness for the ANPR pipeline.
+
+Replays recorded videos and image folders through detection, OCR and
+vehicle matching without a live camera, then scores the reads against a
+labelled ground-truth file.
+
+    python bench_anpr.py --source violation_10sec.mp4 --truth truth.json --json results.json
+    python bench_anpr.py --source samples/ --truth truth.json --speed 20
+
+Ground truth is JSON, a list of entries:
+    {"source": "violation_10sec.mp4", "start_frame": 0, "end_frame": 120, "plate": "MH12AB1234"}
+    {"source": "car_01.jpg", "plate": "KA01AB9012"}
+Frames without an entry are expected to produce no plate.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import time
+from datetime import datetime
+
+import cv2
+
+from anpr_core import ANPRModule
+from video_codec import CaptureSettings, open_capture
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STAGES = ('capture', 'detect', 'ocr', 'match', 'total')
+
+
+def load_truth(path):
+    if not path:
+        return {}
+    with open(path) as f:
+        entries = json.load(f)
+    truth = {}
+    for e in entries:
+        truth.setdefault(os.path.basename(e['source']), []).append(e)
+    return truth
+
+
+def expected_plate(truth, source, frame_idx):
+    for e in truth.get(os.path.basename(source), []):
+        start = e.get('start_frame', 0)
+        end = e.get('end_frame', float('inf'))
+        if start <= frame_idx <= end:
+            return e['plate'].upper()
+    return None
+
+
+def iter_frames(source, stride, capture_settings):
+    """Yields (source_name, frame_idx, frame, capture_seconds)."""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            start = time.perf_counter()
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is not None:
+                yield name, 0, frame, time.perf_counter() - start
+        return
+
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        start = time.perf_counter()
+        frame = cv2.imread(source)
+        if frame is not None:
+            yield os.path.basename(source), 0, frame, time.perf_counter() - start
+        return
+
+    cap = open_capture(source, capture_settings)
+    idx = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            elapsed = time.perf_counter() - start
+            if not ret:
+                break
+            if idx % stride == 0:
+                yield os.path.basename(source), idx, frame, elapsed
+            idx += 1
+    finally:
+        cap.release()
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(pick(50) * 1000, 3),
+        "p90_ms": round(pick(90) * 1000, 3),
+        "p99_ms": round(pick(99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    truth = load_truth(args.truth)
+    known_plates = {e['plate'].upper() for entries in truth.values() for e in entries}
+    if args.vehicles:
+        with open(args.vehicles) as f:
+            known_plates |= {line.strip().upper() for line in f if line.strip()}
+
+    anpr = ANPRModule(stream_url=None, recognizer=args.recognizer)
+    anpr.crop_output = None # No evidence files during replay
+
+    capture_settings = CaptureSettings(threaded=False)
+    latencies = {stage: [] for stage in STAGES}
+    tp = fp = fn = 0
+    plates_seen, plates_read = set(), set()
+    frames = 0
+    frame_interval = 1.0 / args.speed if args.speed else 0.0
+
+    run_start = time.perf_counter()
+    for source_name, idx, frame, capture_s in iter_frames(args.source, args.stride, capture_settings):
+        frame_start = time.perf_counter()
+
+        # Silence the module's console banners so they don't skew the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            crop = anpr.detect_plate(frame)
+            t1 = time.perf_counter()
+            text = anpr.read_plate_text(crop if crop is not None else frame)
+            t2 = time.perf_counter()
+        matched = text if text in known_plates else None
+        t3 = time.perf_counter()
+
+        latencies['capture'].append(capture_s)
+        latencies['detect'].append(t1 - t0)
+        latencies['ocr'].append(t2 - t1)
+        latencies['match'].append(t3 - t2)
+        latencies['total'].append(capture_s + t3 - t0)
+        frames += 1
+
+        expected = expected_plate(truth, source_name, idx)
+        if expected:
+            plates_seen.add(expected)
+        if text and expected and text == expected:
+            tp += 1
+            plates_read.add(expected)
+        else:
+            if text:
+                fp += 1
+            if expected:
+                fn += 1
+
+        if args.verbose:
+            print(f"{source_name}#{idx}: read={text} matched={matched} expected={expected}")
+
+        if frame_interval:
+            # Fixed-rate replay: wait out the rest of this frame's slot
+            remaining = frame_interval - (time.perf_counter() - frame_start)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    wall = time.perf_counter() - run_start
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source": args.source,
+        "recognizer": anpr.reader.name,
+        "speed": args.speed or "max",
+        "stride": args.stride,
+        "frames": frames,
+        "wall_s": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall else None,
+        "latency": {stage: percentiles(samples) for stage, samples in latencies.items()},
+        "accuracy": {
+            "true_positive": tp,
+            "false_positive": fp,
+            "false_negative": fn,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+            "plate_recall": round(len(plates_read) / len(plates_seen), 4) if plates_seen else None,
+        },
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded media through the ANPR pipeline")
+    parser.add_argument('--source', default='violation_10sec.mp4', help="Video file, image file or image folder")
+    parser.add_argument('--truth', help="Ground-truth JSON file")
+    parser.add_argument('--vehicles', help="Optional file of registered plates (one per line) for the match stage")
+    parser.add_argument('--speed', type=float, default=0, help="Replay at this many frames/s (0 = as fast as possible)")
+    parser.add_argument('--stride', type=int, default=1, help="Process every Nth video frame")
+    parser.add_argument('--json', help="Write machine-readable results to this file")
+    parser.add_argument('--recognizer', choices=['easyocr', 'crnn'], help="Plate recognizer (default: ANPR_RECOGNIZER or easyocr)")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"[BENCH] {results['frames']} frames in {results['wall_s']}s ({results['fps']} fps), "
+          f"peak RSS {results['peak_rss_mb']} MB")
+    for stage in STAGES:
+        lat = results['latency'][stage]
+        if lat:
+            print(f"  {stage:<8} p50={lat['p50_ms']}ms p90={lat['p90_ms']}ms p99={lat['p99_ms']}ms")
+    acc = results['accuracy']
+    print(f"  precision={acc['precision']} recall={acc['recall']} plate_recall={acc['plate_recall']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
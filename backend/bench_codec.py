@@ -0,0 +1,105 @@
+"""
+Compares evidence-clip encoder settings on a recorded video.
+
+    python bench_codec.py --input violation_10sec.mp4 --json codec_results.json
+
+For each configuration it reports wall time, encode throughput (frames/s),
+CPU% (this process plus the ffmpeg child) and output file size.
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+import cv2
+
+from video_codec import CodecSettings, CaptureSettings, open_capture, open_writer, ffmpeg_available
+
+DEFAULT_CONFIGS = [
+    CodecSettings(codec='mp4v', backend='opencv'),
+    CodecSettings(codec='h264', backend='opencv'),
+    CodecSettings(codec='h264', backend='ffmpeg_pipe', threads=1, preset='veryfast'),
+    CodecSettings(codec='h264', backend='ffmpeg_pipe', threads=2, preset='veryfast'),
+    CodecSettings(codec='h264', backend='ffmpeg_pipe', threads=4, preset='ultrafast'),
+]
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def load_frames(path, max_frames, capture_settings):
+    cap = open_capture(path, capture_settings)
+    if not cap.isOpened():
+        raise SystemExit(f"[ERROR] Could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+    frames = []
+    start = time.perf_counter()
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    decode_time = time.perf_counter() - start
+    cap.release()
+    return frames, fps, decode_time
+
+
+def bench_encode(frames, fps, settings, out_dir):
+    h, w = frames[0].shape[:2]
+    output_file = os.path.join(out_dir, f"bench_{len(os.listdir(out_dir))}.mp4")
+
+    cpu_before = _cpu_seconds()
+    start = time.perf_counter()
+    writer = open_writer(output_file, (w, h), settings, fps=fps)
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu_before
+
+    size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+    return {
+        "config": settings.describe(),
+        "frames": len(frames),
+        "wall_s": round(wall, 3),
+        "fps": round(len(frames) / wall, 1) if wall else None,
+        "cpu_percent": round(100.0 * cpu / wall, 1) if wall else None,
+        "size_bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark evidence video encode/decode settings")
+    parser.add_argument('--input', default='violation_10sec.mp4')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--decode-threads', type=int, default=2)
+    parser.add_argument('--json', help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    capture_settings = CaptureSettings(decode_threads=args.decode_threads, threaded=False)
+    frames, fps, decode_time = load_frames(args.input, args.max_frames, capture_settings)
+    if not frames:
+        raise SystemExit("[ERROR] No frames decoded")
+    print(f"[BENCH] Decoded {len(frames)} frames in {decode_time:.2f}s "
+          f"({len(frames) / decode_time:.1f} fps, threads={args.decode_threads})")
+
+    configs = [c for c in DEFAULT_CONFIGS if c.backend != 'ffmpeg_pipe' or ffmpeg_available()]
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for settings in configs:
+            r = bench_encode(frames, fps, settings, out_dir)
+            results.append(r)
+            print(f"{r['config']:<55} {r['fps']:>8} fps {r['cpu_percent']:>7}% CPU {r['size_bytes'] / 1024:>9.1f} KiB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"input": args.input, "decode_fps": len(frames) / decode_time, "encode": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark for plate localization preprocessing.
+
+Times preprocess.Preprocessor on synthetic road-like frames at 720p, 1080p
+and 4K for the legacy pipeline and the cheaper settings, and reports the
+per-frame cost.
+
+    python bench_preprocess.py --batch 8 --repeat 5
+    python bench_preprocess.py --resolutions 1080p --opencv-threads 1 --threads 4
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from preprocess import Preprocessor, PreprocessSettings
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4k': (3840, 2160)}
+
+
+def synthetic_frame(width, height, seed, night=False):
+    """Gradient road scene with noise, a few boxes and one plate-like rectangle."""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(40 if night else 90, 70 if night else 200, height, dtype=np.float32)[:, None]
+    frame = np.repeat(base, width, axis=1)
+    frame = frame + rng.normal(0, 12, (height, width))
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    for _ in range(6):
+        x, y = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+        cv2.rectangle(frame, (x, y), (x + int(rng.integers(50, 200)), y + int(rng.integers(50, 200))),
+                      tuple(int(c) for c in rng.integers(0, 255, 3)), -1)
+    pw, ph = width // 8, width // 32
+    px, py = width // 2 - pw // 2, int(height * 0.65)
+    cv2.rectangle(frame, (px, py), (px + pw, py + ph), (235, 235, 235), -1)
+    cv2.rectangle(frame, (px, py), (px + pw, py + ph), (10, 10, 10), max(2, width // 640))
+    cv2.putText(frame, "MH12AB1234", (px + pw // 20, py + int(ph * 0.75)), cv2.FONT_HERSHEY_SIMPLEX,
+                ph / 45.0, (20, 20, 20), max(2, width // 640))
+    return frame
+
+
+def configs(args):
+    common = dict(threads=args.threads, opencv_threads=args.opencv_threads)
+    return {
+        'legacy (bilateral11 full, tree)': PreprocessSettings(denoise='bilateral', detect_width=None,
+                                                              contours='tree', clahe='off', **common),
+        'downscale+bilateral, list': PreprocessSettings(denoise='bilateral', **common),
+        'downscale+median, external': PreprocessSettings(denoise='median', contours='external', **common),
+        'downscale+guided, external': PreprocessSettings(denoise='guided', contours='external', **common),
+        'downscale+bilateral, clahe': PreprocessSettings(denoise='bilateral', clahe='always', **common),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch preprocessing")
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None, help="Frames processed in parallel")
+    parser.add_argument('--opencv-threads', type=int, default=None, help="cv2.setNumThreads value")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for res in args.resolutions:
+        width, height = RESOLUTIONS[res]
+        frames = [synthetic_frame(width, height, i, night=(i % 4 == 3)) for i in range(args.batch)]
+        for name, settings in configs(args).items():
+            pre = Preprocessor(settings)
+            found = sum(loc is not None for _, loc in pre.run(frames)) # warm-up
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                pre.run(frames)
+            per_frame = (time.perf_counter() - start) / (args.repeat * len(frames))
+            results.append({"resolution": res, "config": name, "ms_per_frame": per_frame * 1000,
+                            "fps": 1 / per_frame, "plates_found": found, "frames": len(frames)})
+            print(f"{res:<6} {name:<34} {per_frame * 1000:8.2f} ms/frame {1 / per_frame:8.1f} fps "
+                  f"plates {found}/{len(frames)}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"batch": args.batch, "threads": args.threads, "opencv_threads": args.opencv_threads,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
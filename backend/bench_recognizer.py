@@ -0,0 +1,124 @@
+"""
+Head-to-head benchmark of plate recognizers on labelled plate crops.
+
+Each recognizer runs in its own process, so memory numbers are not mixed
+up with the others' models.
+
+    python bench_recognizer.py --data crops_real --recognizers easyocr crnn --json recog.json
+
+Reports plate accuracy (exact match), character accuracy (1 - edit distance
+/ length), characters/s, crops/s, latency percentiles, model load time and
+resident memory.
+"""
+import argparse
+import json
+import multiprocessing
+import re
+import resource
+import time
+
+import cv2
+
+from plate_crnn import load_labelled
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def rss_mb():
+    # Current resident set from /proc; ru_maxrss only gives the peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_one(name, samples, warmup, queue):
+    from recognizers import get_recognizer
+    base = rss_mb()
+    start = time.perf_counter()
+    recognizer = get_recognizer(name)
+    load_seconds = time.perf_counter() - start
+    loaded = rss_mb()
+
+    crops = [(cv2.imread(path), plate) for path, plate in samples]
+    for image, _ in crops[:warmup]:
+        recognizer.readtext(image)
+
+    latencies, exact, char_errors, chars = [], 0, 0, 0
+    started = time.perf_counter()
+    for image, plate in crops:
+        t0 = time.perf_counter()
+        results = recognizer.readtext(image)
+        latencies.append(time.perf_counter() - t0)
+        read = re.sub(r'[^A-Z0-9]', '', "".join(text for _, text, _ in results).upper())
+        exact += read == plate
+        char_errors += edit_distance(read, plate)
+        chars += len(plate)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    queue.put({
+        "recognizer": name,
+        "crops": len(crops),
+        "plate_accuracy": exact / len(crops),
+        "char_accuracy": max(0.0, 1 - char_errors / max(chars, 1)),
+        "chars_per_s": chars / elapsed,
+        "crops_per_s": len(crops) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "load_s": load_seconds,
+        "model_rss_mb": loaded - base,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare plate recognizers on labelled crops")
+    parser.add_argument('--data', nargs='+', required=True, help="Crop folders (see plate_crnn.py for labels)")
+    parser.add_argument('--recognizers', nargs='+', default=['easyocr', 'crnn'])
+    parser.add_argument('--limit', type=int, default=0, help="Use at most this many crops")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    samples = [s for folder in args.data for s in load_labelled(folder)]
+    if args.limit:
+        samples = samples[:args.limit]
+    if not samples:
+        raise SystemExit("No labelled crops found")
+
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for name in args.recognizers:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_bench_one, args=(name, samples, args.warmup, queue))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0 or queue.empty():
+            print(f"[BENCH] {name} failed (exit code {proc.exitcode})")
+            continue
+        results.append(queue.get())
+
+    print(f"\n{'recognizer':<10} {'plate acc':>9} {'char acc':>9} {'chars/s':>9} {'crops/s':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'load s':>7} {'model MB':>9} {'peak MB':>8}")
+    for r in results:
+        print(f"{r['recognizer']:<10} {r['plate_accuracy']:>9.1%} {r['char_accuracy']:>9.1%} {r['chars_per_s']:>9.0f} "
+              f"{r['crops_per_s']:>8.1f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['load_s']:>7.2f} "
+              f"{r['model_rss_mb']:>9.0f} {r['peak_rss_mb']:>8.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"crops": len(samples), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup cost tracking: import times and time-to-first-job.
+
+    python bench_startup.py --json startup.json
+    python bench_startup.py --modules worker app --top 15
+
+For each entry point it runs a fresh `python -X importtime -c "import <module>"`
+and reports wall time, total import time and the slowest imports. With
+--model it also times a cold recognizer load against a fork of a process
+that already holds the model (what supervisor.py does on restart).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = ['worker', 'app', 'anpr_core', 'list_users', 'notifications', 'export']
+
+
+def import_profile(module, runs=3):
+    """Best-of-N wall time plus the parsed -X importtime tree for one fresh import."""
+    walls = []
+    rows = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                              capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+        rows = []
+        for line in proc.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    top_level = [r for r in rows if not r[0].startswith('  ')]
+    return {
+        "module": module,
+        "wall_s": min(walls),
+        "import_s": sum(r[2] for r in top_level) / 1e6,
+        "modules_imported": len(rows),
+        "slowest": sorted(({"name": n.strip(), "cumulative_ms": c / 1000, "self_ms": s / 1000} for n, s, c in rows),
+                          key=lambda r: r["cumulative_ms"], reverse=True),
+        "heavy_loaded": sorted({n.strip() for n, _, _ in rows} & {'cv2', 'numpy', 'torch', 'easyocr', 'pandas', 'onnxruntime'}),
+    }
+
+
+def model_start_times(recognizer):
+    """Cold start (fresh process loads the model) vs fork of a warm process."""
+    code = ("import time; t = time.perf_counter(); from recognizers import get_recognizer; "
+            f"get_recognizer({recognizer!r}); print(time.perf_counter() - t)")
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        return {"recognizer": recognizer, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    cold = float(proc.stdout.strip().splitlines()[-1])
+
+    from recognizers import get_recognizer
+    get_recognizer(recognizer)
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return {"recognizer": recognizer, "cold_load_s": cold, "warm_fork_s": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and model start-up cost")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help="Slowest imports to list per module")
+    parser.add_argument('--model', choices=['easyocr', 'crnn'], help="Also time cold model load vs warm fork")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports": []}
+    try:
+        from bench_anpr import git_revision
+        results["revision"] = git_revision()
+    except Exception:
+        pass
+
+    for module in args.modules:
+        r = import_profile(module, args.runs)
+        results["imports"].append(r)
+        if "error" in r:
+            print(f"{module:<14} failed: {r['error']}")
+            continue
+        print(f"{module:<14} wall {r['wall_s'] * 1000:7.0f} ms  imports {r['import_s'] * 1000:7.0f} ms  "
+              f"{r['modules_imported']:4d} modules  heavy: {', '.join(r['heavy_loaded']) or '-'}")
+        for row in r["slowest"][:args.top]:
+            print(f"    {row['cumulative_ms']:8.1f} ms  {row['name']}")
+        r["slowest"] = r["slowest"][:args.top]
+
+    if args.model:
+        r = model_start_times(args.model)
+        results["model"] = r
+        if "error" in r:
+            print(f"model {args.model} failed: {r['error']}")
+        else:
+            print(f"model {args.model}: cold load {r['cold_load_s']:.2f}s, fork of warm process {r['warm_fork_s'] * 1000:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from app import app, db, User, Admin
-with app.app_context():
-    print('Admins:', [(a.username, a.email) for a in Admin.query.all()])
-    print('Users:', [(u.email, u.vehicle_number) for u in User.query.all()])
+from models import standalone_session, User, Admin
+with standalone_session() as session:
+    print('Admins:', [(a.username, a.email) for a in session.query(Admin).all()])
+    print('Users:', [(u.email, u.vehicle_number) for u in session.query(User).all()])
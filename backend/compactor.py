@@ -0,0 +1,180 @@
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from models import Blob, Violation, SIGHTING_STATUS, db, create_app
+from events import record_event
+from metrics import REGISTRY, start_exporter
+import media
+import storage
+
+# Retention policy (days)
+HOT_DAYS = int(os.environ.get('BLOB_HOT_DAYS', 30))        # originals kept untouched
+PURGE_DAYS = int(os.environ.get('BLOB_PURGE_DAYS', 180))   # after this, closed challans lose evidence
+COLD_JPEG_QUALITY = 60
+COLD_MAX_WIDTH = 1280
+CLOSED_STATUSES = ('paid', 'closed', SIGHTING_STATUS)
+BATCH_SIZE = 200
+
+BLOBS_TIERED = REGISTRY.counter('compactor_blobs_total', "Blobs moved to the cold or purged tier")
+BYTES_SAVED = REGISTRY.counter('compactor_bytes_saved_total', "Evidence bytes freed by recompression and purging")
+FAILURES = REGISTRY.counter('compactor_failures_total', "Blobs the compactor could not process")
+PASS_SECONDS = REGISTRY.gauge('compactor_last_pass_seconds', "Duration of the last retention pass")
+
+
+def _referencing_violations(ref):
+    return Violation.query.filter(
+        (Violation.image_path == ref) |
+        (Violation.video_path == ref) |
+        (Violation.cropped_plate_path == ref)
+    ).all()
+
+
+def _paired_challans(sighting):
+    """Section-speed challans whose evidence names this row as the entry sighting."""
+    return Violation.query.filter(
+        db.func.json_extract(Violation.evidence, '$.upstream_ref') == sighting.id
+    ).all()
+
+
+def _is_closed(v, purge_cutoff):
+    if v.status not in CLOSED_STATUSES or (v.payment_date or v.timestamp) >= purge_cutoff:
+        return False
+    if v.status == SIGHTING_STATUS:
+        # The entry-camera image is evidence for any challan paired with it
+        return all(_is_closed(c, purge_cutoff) for c in _paired_challans(v))
+    return True
+
+
+def _recompress(data):
+    """Re-encodes an image at a lower quality / resolution for the cold tier."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w > COLD_MAX_WIDTH:
+        img = cv2.resize(img, (COLD_MAX_WIDTH, int(h * COLD_MAX_WIDTH / float(w))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, COLD_JPEG_QUALITY])
+    return buf.tobytes() if ok else None
+
+
+def _drop_derived(store, ref):
+    derived = media._cache_dir(store.local_path(ref))
+    if os.path.isdir(derived):
+        shutil.rmtree(derived, ignore_errors=True)
+
+
+def _purge(store, blob, refs):
+    _drop_derived(store, blob.ref)
+    store.delete(blob.ref)
+    blob.tier = 'purged'
+    blob.tiered_at = datetime.utcnow()
+    # The evidence is gone: move the change feed on so cached views drop it
+    for v in refs:
+        record_event(v, v.status)
+
+
+def _to_cold(store, blob, superseded):
+    """
+    Recompressed bytes are different content, so the cold copy is stored
+    under its own digest and the challans are repointed to it. The original
+    ref is appended to `superseded` and deleted once that is committed; a
+    later upload of the original bytes is then stored afresh instead of
+    being deduplicated onto the degraded copy. Returns the bytes saved.
+    """
+    if not (blob.content_type or '').startswith('image/'):
+        # Videos stay as recorded until purge; re-encoding evidence clips is out of scope here
+        return 0
+    with open(store.local_path(blob.ref), 'rb') as f:
+        data = f.read()
+    smaller = _recompress(data)
+    if smaller is None or len(smaller) >= len(data):
+        blob.tier = 'cold'
+        blob.tiered_at = datetime.utcnow()
+        return 0
+    cold_ref, digest, size, _ = store.put_bytes(smaller, '.jpg')
+    for v in _referencing_violations(blob.ref):
+        for column in ('image_path', 'video_path', 'cropped_plate_path'):
+            if getattr(v, column) == blob.ref:
+                setattr(v, column, cold_ref)
+        record_event(v, v.status) # cached views still hold the old ref
+    if db.session.get(Blob, digest) is None:
+        db.session.add(Blob(sha256=digest, ref=cold_ref, size=size, content_type='image/jpeg',
+                            tier='cold', created_at=blob.created_at, tiered_at=datetime.utcnow()))
+    superseded.append(blob.ref)
+    db.session.delete(blob)
+    return len(data) - size
+
+
+def compact_once(now=None):
+    """
+    Runs one retention pass:
+      hot  -> cold   once a blob is older than HOT_DAYS
+      any  -> purged once every referencing challan is closed and older than PURGE_DAYS
+              (a sighting also waits for the speeding challans paired with it)
+    Unreferenced blobs past HOT_DAYS are purged as well.
+    """
+    store = storage.get_blob_store()
+    now = now or datetime.utcnow()
+    hot_cutoff = now - timedelta(days=HOT_DAYS)
+    purge_cutoff = now - timedelta(days=PURGE_DAYS)
+    stats = {"cold": 0, "purged": 0, "bytes_saved": 0}
+    started = time.perf_counter()
+
+    # Anything past the hot window is a candidate; cold blobs are re-checked
+    # each pass because their challans may have been closed since.
+    # Paged by (created_at, sha256) so the pass holds one batch at a time.
+    candidates = Blob.query.filter(Blob.tier != 'purged', Blob.created_at < hot_cutoff) \
+        .order_by(Blob.created_at, Blob.sha256)
+    last = None
+    while True:
+        page = candidates if last is None else candidates.filter(
+            (Blob.created_at > last[0]) | ((Blob.created_at == last[0]) & (Blob.sha256 > last[1])))
+        batch = page.limit(BATCH_SIZE).all()
+        if not batch:
+            break
+        last = (batch[-1].created_at, batch[-1].sha256)
+        superseded = []
+        for blob in batch:
+            try:
+                refs = _referencing_violations(blob.ref)
+                closed = all(_is_closed(v, purge_cutoff) for v in refs)
+                if closed:
+                    stats["bytes_saved"] += blob.size
+                    _purge(store, blob, refs)
+                    stats["purged"] += 1
+                elif blob.tier == 'hot':
+                    stats["bytes_saved"] += _to_cold(store, blob, superseded)
+                    stats["cold"] += 1
+            except Exception as e:
+                FAILURES.inc()
+                print(f"[COMPACTOR] Failed on {blob.ref}: {e}")
+        db.session.commit()
+        for ref in superseded:
+            _drop_derived(store, ref)
+            store.delete(ref)
+
+    BLOBS_TIERED.inc(stats["cold"], tier='cold')
+    BLOBS_TIERED.inc(stats["purged"], tier='purged')
+    BYTES_SAVED.inc(stats["bytes_saved"])
+    PASS_SECONDS.set(time.perf_counter() - started)
+    return stats
+
+
+def run_compactor(app, interval=3600):
+    print("[COMPACTOR] Started. Enforcing evidence retention tiers...")
+    start_exporter("compactor") # picked up by the API's /metrics
+    while True:
+        with app.app_context():
+            stats = compact_once()
+        if stats["cold"] or stats["purged"]:
+            print(f"[COMPACTOR] cold={stats['cold']} purged={stats['purged']} saved={stats['bytes_saved']} bytes")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    run_compactor(create_app())
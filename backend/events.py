@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from collections import deque
+
+from models import db, Vehicle, ViolationEvent
+
+POLL_INTERVAL = 1.0     # seconds between change-feed reads (one query for all viewers)
+BUFFER_SIZE = 2000      # recent events kept in memory for resuming clients
+HEARTBEAT_INTERVAL = 15 # seconds; keeps proxies from closing idle streams
+
+
+def violation_row(v, owner_name=None):
+    """Row shape shared by /api/admin/challans and the event stream."""
+    if owner_name is None and v.vehicle_number:
+        vehicle = db.session.get(Vehicle, v.vehicle_number)
+        owner_name = vehicle.owner_name if vehicle else None
+    return {
+        "id": v.id,
+        "vehicle_number": v.vehicle_number or "Scanning...",
+        "owner_name": owner_name or "Unknown",
+        "type": v.violation_type,
+        "amount": v.fine_amount,
+        "status": v.status,
+        "location": v.location,
+        "timestamp": v.timestamp.strftime("%Y-%m-%d %H:%M") if v.timestamp else None,
+        "thumbnail": f"/api/media/violation/{v.id}/image/sm",
+    }
+
+
+def record_event(violation, kind):
+    """
+    Adds a change-feed row to the current session. Call before commit so the
+    event is written in the same transaction as the change it describes.
+    The newest event id is also the 'violations' version for response_cache.
+    """
+    db.session.flush() # make sure a new violation has its id
+    db.session.add(ViolationEvent(
+        violation_id=violation.id,
+        kind=kind,
+        payload=json.dumps(violation_row(violation)),
+    ))
+
+
+def current_cursor():
+    return db.session.query(db.func.max(ViolationEvent.id)).scalar() or 0
+
+
+def _to_message(event):
+    return {"id": event.id, "kind": event.kind, "violation": json.loads(event.payload)}
+
+
+def format_sse(message):
+    return f"id: {message['id']}\nevent: {message['kind']}\ndata: {json.dumps(message)}\n\n"
+
+
+class EventBroadcaster:
+    """
+    Reads new ViolationEvent rows once per POLL_INTERVAL and fans them out to
+    every connected dashboard from memory, so DB load stays constant no
+    matter how many admins are watching.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.buffer = deque(maxlen=BUFFER_SIZE)
+        self.last_id = None
+        self.condition = threading.Condition()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                with self.app.app_context():
+                    self.last_id = current_cursor()
+                self.thread = threading.Thread(target=self._poll, name="event-poller", daemon=True)
+                self.thread.start()
+
+    def _poll(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    rows = ViolationEvent.query.filter(ViolationEvent.id > self.last_id) \
+                        .order_by(ViolationEvent.id).limit(500).all()
+                    messages = [_to_message(r) for r in rows]
+                if messages:
+                    with self.condition:
+                        self.buffer.extend(messages)
+                        self.last_id = messages[-1]["id"]
+                        self.condition.notify_all()
+            except Exception as e:
+                print(f"[EVENTS] Poll failed: {e}")
+            time.sleep(POLL_INTERVAL)
+
+    def backlog(self, cursor):
+        """
+        Events after `cursor`. Served from memory when the buffer still covers
+        the cursor; otherwise the gap is read once from the table (needs an
+        app context). The buffer is empty on a fresh process, yet events up
+        to last_id may still be newer than the client's snapshot.
+        """
+        with self.condition:
+            # First id the buffer can serve: its oldest entry, or the next one the poller will read
+            oldest = self.buffer[0]["id"] if self.buffer else self.last_id + 1
+            if oldest <= cursor + 1:
+                return [m for m in self.buffer if m["id"] > cursor]
+        rows = ViolationEvent.query.filter(ViolationEvent.id > cursor, ViolationEvent.id < oldest) \
+            .order_by(ViolationEvent.id).all()
+        with self.condition:
+            return [_to_message(r) for r in rows] + [m for m in self.buffer if m["id"] > cursor]
+
+    def stream(self, cursor, backlog):
+        """SSE generator for one client. `backlog` comes from backlog(cursor)."""
+        for message in backlog:
+            yield format_sse(message)
+            cursor = message["id"]
+
+        yield "retry: 3000\n\n"
+        while True:
+            with self.condition:
+                # Wait on the buffer, not last_id: only buffered events can be sent from here
+                self.condition.wait_for(lambda: self.buffer and self.buffer[-1]["id"] > cursor,
+                                        timeout=HEARTBEAT_INTERVAL)
+                behind = bool(self.buffer) and self.buffer[0]["id"] > cursor + 1
+                pending = [] if behind else [m for m in self.buffer if m["id"] > cursor]
+            if behind:
+                # A slow client fell past the oldest buffered event; read the gap from the table
+                with self.app.app_context():
+                    pending = self.backlog(cursor)
+            if not pending:
+                yield ": heartbeat\n\n"
+                continue
+            for message in pending:
+                yield format_sse(message)
+            cursor = pending[-1]["id"]
@@ -0,0 +1,314 @@
+"""
+Streaming bulk exports of challans, payments and vehicles.
+
+Rows are read in keyset pages of CHUNK_ROWS (key > last key seen), each in
+its own short read, and written a page at a time as pandas frames, so memory
+stays flat whatever the table size and no read stays open long enough to
+lock out writers on the rollback-journal database. The API runs
+exports as background jobs (ExportJob rows); the CLI writes straight to a
+file:
+
+    python export.py violations --format csv --gzip --since 2025-01-01 --out challans.csv.gz
+    python export.py payments --format parquet --status success --out payments.parquet
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from lazy_imports import lazy_import
+from models import db, Violation, Vehicle, Payment, User, ExportJob, SIGHTING_STATUS
+
+pd = lazy_import('pandas') # only the export thread needs it, not every API start
+
+EXPORT_FOLDER = os.environ.get('EXPORT_FOLDER', 'exports')
+CHUNK_ROWS = 5000
+FORMATS = ('csv', 'parquet')
+EXPORT_TTL_DAYS = 7  # finished files older than this are removed when new exports start
+HEARTBEAT_INTERVAL = 30 # seconds between lease refreshes for this process's jobs
+LEASE_SECONDS = 120     # a queued/running job not refreshed for this long belongs to a dead process
+
+# (column name, SQL expression, kind); kinds fix the Parquet schema up front,
+# since a single chunk can be all NULL for a column
+DATASETS = {
+    'violations': {
+        'columns': [
+            ('violation_id', Violation.id, 'int'),
+            ('vehicle_number', Violation.vehicle_number, 'str'),
+            ('owner_name', Vehicle.owner_name, 'str'),
+            ('vehicle_type', Vehicle.vehicle_type, 'str'),
+            ('contact_number', Vehicle.contact_number, 'str'),
+            ('violation_type', Violation.violation_type, 'str'),
+            ('location', Violation.location, 'str'),
+            ('camera_id', Violation.camera_id, 'int'),
+            ('captured_at', db.func.coalesce(Violation.captured_at, Violation.timestamp), 'datetime'),
+            ('status', Violation.status, 'str'),
+            ('fine_amount', Violation.fine_amount, 'float'),
+            ('confidence_score', Violation.confidence_score, 'float'),
+            ('payment_date', Violation.payment_date, 'datetime'),
+            ('transaction_id', Violation.transaction_id, 'str'),
+        ],
+        'joins': [(Vehicle, Vehicle.vehicle_number == Violation.vehicle_number, True)],
+        'date': db.func.coalesce(Violation.captured_at, Violation.timestamp),
+        'status': Violation.status,
+        'where': Violation.status != SIGHTING_STATUS, # section-camera sightings aren't challans
+        'key': Violation.id,
+    },
+    'payments': {
+        'columns': [
+            ('payment_id', Payment.id, 'int'),
+            ('transaction_ref', Payment.transaction_ref, 'str'),
+            ('payment_date', Payment.payment_date, 'datetime'),
+            ('amount', Payment.amount, 'float'),
+            ('payment_status', Payment.status, 'str'),
+            ('violation_id', Violation.id, 'int'),
+            ('violation_type', Violation.violation_type, 'str'),
+            ('location', Violation.location, 'str'),
+            ('vehicle_number', Violation.vehicle_number, 'str'),
+            ('owner_name', Vehicle.owner_name, 'str'),
+            ('user_id', User.id, 'int'),
+            ('user_email', User.email, 'str'),
+        ],
+        'joins': [
+            (Violation, Violation.id == Payment.violation_id, False),
+            (User, User.id == Payment.user_id, True),
+            (Vehicle, Vehicle.vehicle_number == Violation.vehicle_number, True),
+        ],
+        'date': Payment.payment_date,
+        'status': Payment.status,
+        'where': None,
+        'key': Payment.id,
+    },
+    'vehicles': {
+        'columns': [
+            ('vehicle_number', Vehicle.vehicle_number, 'str'),
+            ('owner_name', Vehicle.owner_name, 'str'),
+            ('vehicle_model', Vehicle.vehicle_model, 'str'),
+            ('vehicle_type', Vehicle.vehicle_type, 'str'),
+            ('contact_number', Vehicle.contact_number, 'str'),
+            ('registration_date', Vehicle.registration_date, 'datetime'),
+        ],
+        'joins': [],
+        'date': Vehicle.registration_date,
+        'status': None,
+        'where': None,
+        'key': Vehicle.vehicle_number,
+    },
+}
+
+_PANDAS_TYPES = {'int': 'Int64', 'float': 'float64', 'str': 'string', 'datetime': 'datetime64[ns]'}
+
+
+def build_query(dataset, since=None, until=None, status=None):
+    spec = DATASETS[dataset]
+    columns = [expr.label(name) for name, expr, _ in spec['columns']]
+    stmt = db.select(*columns).select_from(spec['key'].class_)
+    for model, on, outer in spec['joins']:
+        stmt = stmt.join(model, on, isouter=outer)
+    if spec['where'] is not None:
+        stmt = stmt.where(spec['where'])
+    if isinstance(getattr(spec['date'], 'type', None), db.Date):
+        # Date columns compare as 'YYYY-MM-DD' strings in SQLite; a datetime bound would not match
+        since = since.date() if since else None
+        until = until.date() if until else None
+    if since:
+        stmt = stmt.where(spec['date'] >= since)
+    if until:
+        stmt = stmt.where(spec['date'] < until + timedelta(days=1))
+    if status and spec['status'] is not None:
+        stmt = stmt.where(spec['status'].in_(status))
+    return stmt.order_by(spec['key'])
+
+
+def iter_frames(dataset, since=None, until=None, status=None, chunk_rows=CHUNK_ROWS):
+    """Yields DataFrames of at most chunk_rows rows, one keyset page at a time."""
+    spec = DATASETS[dataset]
+    names = [name for name, _, _ in spec['columns']]
+    key_index = next(i for i, (_, expr, _) in enumerate(spec['columns']) if expr is spec['key'])
+    stmt = build_query(dataset, since, until, status).limit(chunk_rows)
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(spec['key'] > last)
+        # A connection per page: the SQLite read lock is held only while the page is fetched
+        with db.engine.connect() as conn:
+            rows = conn.execute(page).all()
+        if not rows:
+            return
+        last = rows[-1][key_index]
+        frame = pd.DataFrame.from_records(rows, columns=names)
+        for name, _, kind in spec['columns']:
+            frame[name] = frame[name].astype(_PANDAS_TYPES[kind]) if kind != 'datetime' \
+                else pd.to_datetime(frame[name])
+        yield frame
+        if len(rows) < chunk_rows:
+            return
+
+
+def write_csv(frames, path, compress=False):
+    rows = 0
+    with (gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')) as f:
+        for i, frame in enumerate(frames):
+            frame.to_csv(f, header=(i == 0), index=False)
+            rows += len(frame)
+    return rows
+
+
+def write_parquet(frames, path, dataset, compress=False):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(), 'datetime': pa.timestamp('ns')}
+    schema = pa.schema([(name, arrow_types[kind]) for name, _, kind in DATASETS[dataset]['columns']])
+    rows = 0
+    # One row group per chunk; nothing is held beyond the current frame
+    with pq.ParquetWriter(path, schema, compression='gzip' if compress else 'snappy') as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+    return rows
+
+
+def export_to_file(dataset, fmt, path, since=None, until=None, status=None, compress=False):
+    """Writes one export and returns the number of rows. Needs an app context."""
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}")
+    frames = iter_frames(dataset, since, until, status)
+    if fmt == 'parquet':
+        return write_parquet(frames, path, dataset, compress)
+    return write_csv(frames, path, compress)
+
+
+def file_name(job):
+    ext = 'parquet' if job.format == 'parquet' else ('csv.gz' if job.compress else 'csv')
+    return f"{job.dataset}-{job.created_at:%Y%m%d-%H%M%S}-{job.id[:8]}.{ext}"
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+class ExportRunner:
+    """
+    Runs queued ExportJob rows one at a time on a background thread. Every
+    API process has its own runner, so each keeps a lease on its own jobs
+    (heartbeat_at); recover() only fails jobs whose lease has lapsed.
+    """
+    def __init__(self, app, folder=EXPORT_FOLDER):
+        self.app = app
+        self.folder = folder
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        self.owned = set() # ids of jobs queued or running in this process
+        self.lock = threading.Lock()
+        self.heartbeat = None
+        os.makedirs(folder, exist_ok=True)
+
+    def recover(self):
+        """Jobs whose process died are marked failed rather than left running forever."""
+        stale = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+        for job in ExportJob.query.filter(
+            ExportJob.status.in_(['queued', 'running']),
+            db.func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < stale
+        ).all():
+            job.status = 'error'
+            job.error = 'Interrupted by server restart'
+        db.session.commit()
+
+    def _refresh_leases(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self.lock:
+                owned = list(self.owned)
+            if not owned:
+                continue
+            try:
+                with self.app.app_context():
+                    ExportJob.query.filter(ExportJob.id.in_(owned)) \
+                        .update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+            except Exception as e:
+                print(f"[EXPORT] Lease refresh failed: {e}")
+
+    def submit(self, dataset, fmt, compress=False, since=None, until=None, status=None):
+        job = ExportJob(id=uuid.uuid4().hex, dataset=dataset, format=fmt, compress=compress,
+                        filters=json.dumps({"since": since, "until": until, "status": status}),
+                        heartbeat_at=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+        with self.lock:
+            self.owned.add(job.id)
+            if self.heartbeat is None:
+                self.heartbeat = threading.Thread(target=self._refresh_leases, name="export-lease", daemon=True)
+                self.heartbeat.start()
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def path_for(self, job):
+        return os.path.join(self.folder, job.file_name)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'running'
+            job.file_name = file_name(job)
+            db.session.commit()
+            filters = json.loads(job.filters)
+            path = self.path_for(job)
+            try:
+                rows = export_to_file(job.dataset, job.format, path + ".part",
+                                      parse_date(filters['since']), parse_date(filters['until']),
+                                      filters['status'], job.compress)
+                os.replace(path + ".part", path) # a download never sees a half-written file
+                job.rows = rows
+                job.size = os.path.getsize(path)
+                job.status = 'done'
+                print(f"[EXPORT] {job.dataset} -> {path} ({rows} rows)")
+            except Exception as e:
+                print(f"[EXPORT] Job {job.id} failed: {e}")
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+                job.status = 'error'
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            with self.lock:
+                self.owned.discard(job.id)
+            self._expire_old()
+
+    def _expire_old(self):
+        cutoff = datetime.utcnow() - timedelta(days=EXPORT_TTL_DAYS)
+        for job in ExportJob.query.filter(ExportJob.status == 'done', ExportJob.finished_at < cutoff).all():
+            path = self.path_for(job)
+            if os.path.exists(path):
+                os.remove(path)
+            job.status = 'expired'
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export challans, payments or vehicles")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--gzip', action='store_true', help="gzip CSV output / gzip-compressed Parquet pages")
+    parser.add_argument('--since', help="YYYY-MM-DD")
+    parser.add_argument('--until', help="YYYY-MM-DD (inclusive)")
+    parser.add_argument('--status', nargs='+')
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    from models import create_app
+    app = create_app()
+    with app.app_context():
+        rows = export_to_file(args.dataset, args.format, args.out, parse_date(args.since),
+                              parse_date(args.until), args.status, args.gzip)
+    print(f"[EXPORT] Wrote {rows} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
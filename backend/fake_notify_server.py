@@ -0,0 +1,145 @@
+"""
+Local stand-ins for the SMS gateway and SMTP relay used by notifications.py.
+
+    python fake_notify_server.py                   # SMS on :8026, SMTP on :1025
+    python fake_notify_server.py --fail-rate 0.3   # reject 30% of SMS to exercise retries
+
+Received messages are printed and kept in memory (`.messages`) so scripts
+can start the servers in-process and check what arrived.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSmsGateway:
+    def __init__(self, port=8026, fail_rate=0.0):
+        self.port = port
+        self.fail_rate = fail_rate
+        self.messages = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != '/sms/batch':
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                results = []
+                with gateway.lock:
+                    gateway.requests += 1
+                    for m in payload.get('messages', []):
+                        if random.random() < gateway.fail_rate:
+                            results.append({"id": m.get("id"), "ok": False, "error": "carrier rejected"})
+                            continue
+                        gateway.messages.append(m)
+                        results.append({"id": m.get("id"), "ok": True})
+                        print(f"[FAKE-SMS] to {m.get('to')}: {m.get('body')}")
+                body = json.dumps({"results": results}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-sms", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class FakeSmtpServer:
+    """Just enough SMTP (HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) to accept mail."""
+    def __init__(self, port=1025):
+        self.port = port
+        self.messages = []
+        self.sessions = 0
+        self.loop = None
+        self.ready = threading.Event()
+
+    async def _handle(self, reader, writer):
+        self.sessions += 1
+
+        async def reply(line):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 fake-smtp ready")
+        mail_from, rcpt_to = None, []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                await reply("250 fake-smtp")
+            elif verb == 'MAIL':
+                mail_from, rcpt_to = command.split(':', 1)[1].strip(), []
+                await reply("250 OK")
+            elif verb == 'RCPT':
+                rcpt_to.append(command.split(':', 1)[1].strip().strip('<>'))
+                await reply("250 OK")
+            elif verb == 'DATA':
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = await reader.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                msg = message_from_bytes(b"".join(data))
+                self.messages.append({"from": mail_from, "to": rcpt_to, "subject": msg['Subject'],
+                                      "body": msg.get_payload()})
+                print(f"[FAKE-SMTP] to {', '.join(rcpt_to)}: {msg['Subject']}")
+                await reply("250 OK queued")
+            elif verb in ('RSET', 'NOOP'):
+                await reply("250 OK")
+            elif verb == 'QUIT':
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+        writer.close()
+
+    def start(self):
+        def _run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', self.port))
+            self.ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=_run, name="fake-smtp", daemon=True).start()
+        self.ready.wait(5)
+        return self
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake SMS gateway and SMTP server")
+    parser.add_argument('--sms-port', type=int, default=8026)
+    parser.add_argument('--smtp-port', type=int, default=1025)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of SMS to reject")
+    args = parser.parse_args()
+    FakeSmsGateway(args.sms_port, args.fail_rate).start()
+    FakeSmtpServer(args.smtp_port).start()
+    print(f"[FAKE] SMS gateway on :{args.sms_port}/sms/batch, SMTP on :{args.smtp_port}")
+    while True:
+        time.sleep(3600)
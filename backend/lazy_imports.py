@@ -0,0 +1,59 @@
+"""
+Deferred imports for heavy dependencies (cv2, numpy, torch-backed OCR).
+
+    cv2 = lazy_import('cv2')
+
+binds a placeholder that imports the real module on first attribute access,
+so CLIs and the API only pay for OpenCV/NumPy when a code path uses them.
+preload() resolves them up front instead; the pre-forking supervisor does
+that so forked children inherit ready modules.
+"""
+import importlib
+import threading
+
+_lock = threading.Lock()
+_proxies = []
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        _proxies.append(self)
+
+    def _load(self):
+        with _lock:
+            if self._module is None:
+                name = self._name
+                module = importlib.import_module(name)
+                # Copy the namespace so later lookups are plain instance-dict hits
+                self.__dict__.update(module.__dict__)
+                self.__dict__.update(_name=name, _module=module)
+        return self._module
+
+    def __getattr__(self, attr):
+        # Only called for names not in __dict__ yet, i.e. before the first load
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def preload(*names):
+    """
+    Imports `names` now and resolves every lazy placeholder for them (all
+    placeholders if no names are given), e.g. in a supervisor before forking.
+    """
+    for name in names:
+        importlib.import_module(name)
+    for proxy in list(_proxies):
+        if not names or proxy._name in names:
+            proxy._load()
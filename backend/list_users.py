@@ -1,6 +1,6 @@
-from app import app, db, User
-with app.app_context():
-    users = User.query.all()
+from models import standalone_session, User
+with standalone_session() as session:
+    users = session.query(User).all()
     print("Users Found:", len(users))
     for u in users:
         print(f"ID: {u.id}, Email: {u.email}, Vehicle: {u.vehicle_number}")
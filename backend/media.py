@@ -0,0 +1,176 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+
+from storage import resolve_path
+from metrics import cache_result
+
+cv2 = lazy_import('cv2')
+
+# Fixed thumbnail widths served to list views (height follows aspect ratio)
+THUMB_SIZES = {"sm": 160, "md": 320, "lg": 640}
+THUMB_FORMATS = ("webp", "jpg")
+MEDIA_CACHE_FOLDER = 'media_cache'
+
+# (OpenCV flag name, value) pairs, resolved when cv2 is first used
+_ENCODE_PARAMS = {
+    "webp": [("IMWRITE_WEBP_QUALITY", 80)],
+    "jpg": [("IMWRITE_JPEG_QUALITY", 80), ("IMWRITE_JPEG_OPTIMIZE", 1)],
+}
+
+
+def _encode_params(fmt):
+    return [v for flag, value in _ENCODE_PARAMS[fmt] for v in (getattr(cv2, flag), value)]
+
+
+def _cache_dir(source_path):
+    """
+    Derived files live under media_cache/<digest of the source path>/ so that
+    every evidence file gets its own folder without touching the originals.
+    """
+    digest = hashlib.sha1(os.path.normpath(source_path).encode('utf-8')).hexdigest()
+    return os.path.join(MEDIA_CACHE_FOLDER, digest[:2], digest)
+
+
+def thumbnail_path(source_path, size, fmt):
+    return os.path.join(_cache_dir(source_path), f"{size}.{fmt}")
+
+
+def poster_path(video_path):
+    return os.path.join(_cache_dir(video_path), "poster.jpg")
+
+
+def _write_atomic(path, data):
+    # Write to a temp file first so a concurrent reader never sees a half-written image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _resize_to_width(img, width):
+    h, w = img.shape[:2]
+    if w <= width:
+        return img
+    height = max(1, int(round(h * width / float(w))))
+    # INTER_AREA gives the cleanest result when shrinking
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def generate_thumbnails(source_path, img=None):
+    """
+    Generates every size/format combination for an image.
+    Returns a dict of {(size, fmt): path} for the files that were written.
+    """
+    if img is None:
+        img = cv2.imread(source_path)
+    if img is None:
+        print(f"[MEDIA] Could not read image for thumbnails: {source_path}")
+        return {}
+
+    written = {}
+    # Resize from the largest size down, reusing the previous result as the source
+    current = img
+    for size, width in sorted(THUMB_SIZES.items(), key=lambda s: s[1], reverse=True):
+        current = _resize_to_width(current, width)
+        for fmt in THUMB_FORMATS:
+            ok, buf = cv2.imencode(f".{fmt}", current, _encode_params(fmt))
+            if not ok:
+                continue
+            path = thumbnail_path(source_path, size, fmt)
+            _write_atomic(path, buf.tobytes())
+            written[(size, fmt)] = path
+    return written
+
+
+def generate_poster(video_path, at_msec=1000):
+    """
+    Extracts a representative frame from an MP4 clip and writes it as the poster.
+    Falls back to the first decodable frame for clips shorter than `at_msec`.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"[MEDIA] Could not open video for poster: {video_path}")
+        return None
+
+    try:
+        cap.set(cv2.CAP_PROP_POS_MSEC, at_msec)
+        ret, frame = cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+        if not ret:
+            return None
+    finally:
+        cap.release()
+
+    ok, buf = cv2.imencode(".jpg", frame, _encode_params("jpg"))
+    if not ok:
+        return None
+    path = poster_path(video_path)
+    _write_atomic(path, buf.tobytes())
+    # Poster thumbnails are keyed on the poster file itself
+    generate_thumbnails(path, img=frame)
+    return path
+
+
+def ensure_thumbnail(source_path, size, fmt, is_video=False):
+    """
+    Returns the path of a derived image, generating it on demand if the
+    background job has not produced it yet (e.g. rows created before this existed).
+    """
+    if size not in THUMB_SIZES or fmt not in THUMB_FORMATS:
+        return None
+    if not source_path or not os.path.exists(source_path):
+        return None
+
+    if is_video:
+        poster = poster_path(source_path)
+        if not os.path.exists(poster):
+            poster = generate_poster(source_path)
+            if poster is None:
+                return None
+        source_path = poster
+
+    path = thumbnail_path(source_path, size, fmt)
+    hit = os.path.exists(path)
+    cache_result('thumbnail', hit)
+    if not hit:
+        generate_thumbnails(source_path)
+    return path if os.path.exists(path) else None
+
+
+class MediaPipeline:
+    """
+    Generates thumbnails and video posters in the background so the OCR loop
+    never waits on image encoding.
+    """
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media")
+
+    def _process(self, image_path, cropped_plate_path, video_path):
+        try:
+            for path in (image_path, cropped_plate_path):
+                path = resolve_path(path)
+                if path and os.path.exists(path):
+                    generate_thumbnails(path)
+            video_path = resolve_path(video_path)
+            if video_path and os.path.exists(video_path):
+                generate_poster(video_path)
+        except Exception as e:
+            print(f"[MEDIA] Derived image generation failed: {e}")
+
+    def submit_violation(self, violation):
+        # Copy the paths now; the ORM object must not be touched from another thread
+        return self.executor.submit(
+            self._process,
+            violation.image_path,
+            violation.cropped_plate_path,
+            violation.video_path,
+        )
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
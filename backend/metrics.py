@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Where each process drops its snapshot so the API can serve one combined /metrics page
+METRICS_DIR = os.environ.get('ANPR_METRICS_DIR', 'metrics')
+SNAPSHOT_MAX_AGE = 120 # seconds; older snapshots belong to dead processes
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def snapshot(self):
+        data = {}
+        for name, m in list(self.metrics.items()):
+            with m.lock:
+                data[name] = {
+                    "kind": m.kind,
+                    "help": m.help,
+                    "buckets": list(getattr(m, 'buckets', ())),
+                    "values": [[list(map(list, k)), v if not isinstance(v, dict) else dict(v, buckets=list(v["buckets"]))]
+                               for k, v in m.values.items()],
+                }
+        return data
+
+
+REGISTRY = Registry()
+
+# Pipeline metrics shared by the worker, the ANPR module and the API
+STAGE_SECONDS = REGISTRY.histogram('anpr_stage_seconds', "Time spent in each pipeline stage")
+STAGE_ERRORS = REGISTRY.counter('anpr_stage_errors_total', "Exceptions raised per pipeline stage")
+QUEUE_DEPTH = REGISTRY.gauge('anpr_queue_depth', "Violations waiting to be processed")
+WORKER_BUSY = REGISTRY.counter('anpr_worker_busy_seconds_total', "Seconds the worker spent processing")
+WORKER_IDLE = REGISTRY.counter('anpr_worker_idle_seconds_total', "Seconds the worker spent waiting for work")
+JOBS = REGISTRY.counter('anpr_jobs_total', "Processed violations by outcome")
+CACHE_HITS = REGISTRY.counter('cache_hits_total', "Cache hits by cache name")
+CACHE_MISSES = REGISTRY.counter('cache_misses_total', "Cache misses by cache name")
+DB_QUERIES = REGISTRY.counter('db_queries_total', "SQL statements executed")
+DB_QUERY_SECONDS = REGISTRY.histogram('db_query_seconds', "SQL statement latency")
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', "API requests by endpoint and status")
+HTTP_SECONDS = REGISTRY.histogram('http_request_seconds', "API request latency by endpoint")
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Records the duration of a pipeline stage; exceptions are counted and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, **labels)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+def cache_result(cache, hit):
+    (CACHE_HITS if hit else CACHE_MISSES).inc(cache=cache)
+
+
+def instrument_engine(engine):
+    """Counts and times every SQL statement run through a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        op = statement.lstrip().split(' ', 1)[0].upper()
+        DB_QUERIES.inc(op=op)
+        DB_QUERY_SECONDS.observe(elapsed, op=op)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute never fires for a failed statement; drop its start time
+        # so the next statement isn't timed from it
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts and context.execution_context is not None:
+            starts.pop()
+
+
+# ============================
+# EXPOSITION
+# ============================
+
+def _render_family(name, family, lines):
+    lines.append(f"# HELP {name} {family['help']}")
+    lines.append(f"# TYPE {name} {family['kind']}")
+    for process, m in family["series"]:
+        extra = {"process": process}
+        for key, value in m["values"]:
+            key = tuple(tuple(kv) for kv in key)
+            if m["kind"] == 'histogram':
+                for bound, count in zip(m["buckets"], value["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(key, dict(extra, le=bound))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key, dict(extra, le='+Inf'))} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(key, extra)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(key, extra)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(key, extra)} {value}")
+
+
+def render(process="api"):
+    """
+    Prometheus text exposition for this process plus every fresh snapshot
+    written by other processes (worker, compactor...) into METRICS_DIR.
+    Series from all processes are grouped under one HELP/TYPE header per metric.
+    """
+    snapshots = [(process, REGISTRY.snapshot())]
+    if os.path.isdir(METRICS_DIR):
+        now = time.time()
+        for name in sorted(os.listdir(METRICS_DIR)):
+            path = os.path.join(METRICS_DIR, name)
+            if not name.endswith('.json') or now - os.path.getmtime(path) > SNAPSHOT_MAX_AGE:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append((name[:-5], json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+    families = {}
+    for proc, snapshot in snapshots:
+        for name, m in snapshot.items():
+            if not m["values"]:
+                continue
+            family = families.setdefault(name, {"help": m["help"], "kind": m["kind"], "series": []})
+            family["series"].append((proc, m))
+
+    lines = []
+    for name in sorted(families):
+        _render_family(name, families[name], lines)
+    return "\n".join(lines) + "\n"
+
+
+def dump_snapshot(process_name):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{process_name}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def start_exporter(process_name, interval=10):
+    """Periodically writes this process's metrics for the API to pick up."""
+    def _loop():
+        while True:
+            try:
+                dump_snapshot(process_name)
+            except OSError as e:
+                print(f"[METRICS] Snapshot failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name="metrics-exporter", daemon=True)
+    thread.start()
+    return thread
+
+
+# ============================
+# SAMPLING PROFILER (opt-in)
+# ============================
+
+PROFILE_ENABLED = os.environ.get('ANPR_PROFILE', '0') == '1'
+PROFILE_DIR = os.environ.get('ANPR_PROFILE_DIR', 'profiles')
+PROFILE_THRESHOLD = float(os.environ.get('ANPR_PROFILE_THRESHOLD', 2.0)) # seconds
+PROFILE_INTERVAL = 0.005
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack at a fixed interval and aggregates the
+    results as folded stacks (the input format of flamegraph.pl / speedscope).
+    """
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            folded = ";".join(reversed(stack))
+            self.stacks[folded] = self.stacks.get(folded, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_job(name, threshold=None):
+    """
+    When ANPR_PROFILE=1, samples the current thread for the duration of the
+    block and keeps the flamegraph data only if the job was slow.
+    """
+    if not PROFILE_ENABLED:
+        yield
+        return
+
+    threshold = PROFILE_THRESHOLD if threshold is None else threshold
+    profiler = SamplingProfiler(threading.get_ident())
+    profiler.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - start
+        if elapsed >= threshold:
+            path = os.path.join(PROFILE_DIR, f"{name}-{int(time.time())}.folded")
+            profiler.write_folded(path)
+            print(f"[PROFILE] Slow job {name} ({elapsed:.2f}s) -> {path}")
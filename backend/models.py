@@ -22,9 +22,44 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        upgrade_schema()
 
     return app
 
+# Columns added after tables were first created. db.create_all() never alters
+# an existing table, so these are added in place on startup.
+ADDED_COLUMNS = {
+    'violation': {
+        'camera_id': 'INTEGER REFERENCES camera(id)',
+        'captured_at': 'DATETIME',
+        'evidence': 'TEXT',
+        'priority_class': 'VARCHAR(10)',
+    },
+    'export_job': {
+        'heartbeat_at': 'DATETIME',
+    },
+}
+
+def standalone_session():
+    """
+    Plain SQLAlchemy session on the app database for scripts: no Flask app,
+    no create_all()/upgrade_schema(). Flask-SQLAlchemy keeps relative SQLite
+    paths under instance/, so point there too.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'echallan.db')
+    return Session(create_engine(f"sqlite:///{path}"))
+
+def upgrade_schema():
+    inspector = db.inspect(db.engine)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        for name, ddl in columns.items():
+            if name not in existing:
+                db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    db.session.commit()
+
 # ==========================================
 # DATABASE MODELS
 # ==========================================
@@ -61,6 +96,10 @@ class Donation(db.Model): # Placeholder for payment logic if needed later
     id = db.Column(db.Integer, primary_key=True)
     pass
 
+# Under-limit pass at a section-speed camera: kept as the entry point for
+# pairing, but it is not a challan and is left out of user/admin listings
+SIGHTING_STATUS = 'cleared'
+
 class Violation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     vehicle_number = db.Column(db.String(20), db.ForeignKey('vehicle.vehicle_number'), nullable=True)
@@ -75,6 +114,10 @@ class Violation(db.Model):
     confidence_score = db.Column(db.Float, default=0.0)
     payment_date = db.Column(db.DateTime, nullable=True)
     transaction_id = db.Column(db.String(100), nullable=True)
+    camera_id = db.Column(db.Integer, db.ForeignKey('camera.id'), nullable=True)
+    captured_at = db.Column(db.DateTime, nullable=True) # time on the camera, not upload time
+    evidence = db.Column(db.Text, nullable=True) # JSON, e.g. section speed computation
+    priority_class = db.Column(db.String(10), nullable=True) # live (default), reupload, backfill
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -100,3 +143,68 @@ class Camera(db.Model):
     ip_address = db.Column(db.String(50), nullable=True)
     status = db.Column(db.String(20), default='active')
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Blob(db.Model):
+    # Content-addressed evidence object; Violation paths hold `ref`
+    sha256 = db.Column(db.String(64), primary_key=True)
+    ref = db.Column(db.String(200), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(50), nullable=True)
+    tier = db.Column(db.String(10), default='hot') # hot, cold, purged
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    tiered_at = db.Column(db.DateTime, nullable=True)
+
+class ViolationEvent(db.Model):
+    # Append-only change feed; the id doubles as the resume cursor for dashboards
+    __table_args__ = {'sqlite_autoincrement': True} # ids must never be reused
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    violation_id = db.Column(db.Integer, db.ForeignKey('violation.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False) # created, processed, needs_review, error, paid
+    payload = db.Column(db.Text, nullable=False) # JSON row as served by /api/admin/challans
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CameraSegment(db.Model):
+    # Pair of cameras with a known road distance for average speed enforcement
+    id = db.Column(db.Integer, primary_key=True)
+    upstream_camera_id = db.Column(db.Integer, db.ForeignKey('camera.id'), nullable=False)
+    downstream_camera_id = db.Column(db.Integer, db.ForeignKey('camera.id'), nullable=False)
+    distance_m = db.Column(db.Float, nullable=False)
+    speed_limit_kmph = db.Column(db.Float, nullable=False)
+    active = db.Column(db.Boolean, default=True)
+
+class ExportJob(db.Model):
+    # Background bulk export; the file lives in EXPORT_FOLDER under file_name
+    id = db.Column(db.String(32), primary_key=True)
+    dataset = db.Column(db.String(20), nullable=False) # violations, payments, vehicles
+    format = db.Column(db.String(10), nullable=False) # csv, parquet
+    compress = db.Column(db.Boolean, default=False)
+    filters = db.Column(db.Text, nullable=True) # JSON: since, until, status
+    status = db.Column(db.String(10), default='queued') # queued, running, done, error, expired
+    file_name = db.Column(db.String(200), nullable=True)
+    rows = db.Column(db.Integer, nullable=True)
+    size = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True) # refreshed by the owning API process while queued/running
+
+class NotificationOutbox(db.Model):
+    # Written in the same transaction as the violation; notifications.py delivers it
+    id = db.Column(db.Integer, primary_key=True)
+    violation_id = db.Column(db.Integer, db.ForeignKey('violation.id'), nullable=False)
+    channel = db.Column(db.String(10), nullable=False) # sms, email
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    dedup_key = db.Column(db.String(200), unique=True, nullable=False) # one message per challan/channel/recipient
+    status = db.Column(db.String(10), default='pending') # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+class CacheVersion(db.Model):
+    # Bumped on writes that cached API responses depend on (see response_cache.py)
+    scope = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
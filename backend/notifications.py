@@ -0,0 +1,276 @@
+"""
+Challan notifications through a transactional outbox.
+
+The worker calls enqueue_for_violation() before it commits a processed
+violation, so outbox rows exist exactly when the challan does and OCR never
+waits on the network. This module's dispatcher (`python notifications.py`)
+claims due rows in batches and sends them with asyncio: SMS through an HTTP
+gateway's batch endpoint, email over one SMTP connection per batch. Each
+channel has its own rate limit; failures are retried with exponential
+backoff and given up after MAX_ATTEMPTS.
+
+Run fake_notify_server.py for a local SMS gateway and SMTP server.
+"""
+import asyncio
+import os
+import random
+import smtplib
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from lazy_imports import lazy_import
+from models import db, User, Vehicle, NotificationOutbox
+from metrics import REGISTRY
+
+requests = lazy_import('requests')
+
+SMS_GATEWAY_URL = os.environ.get('SMS_GATEWAY_URL', 'http://localhost:8026/sms/batch')
+SMS_RATE = float(os.environ.get('SMS_RATE', 10))      # messages per second
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 1025))
+SMTP_FROM = os.environ.get('SMTP_FROM', 'echallan@localhost')
+EMAIL_RATE = float(os.environ.get('EMAIL_RATE', 5))   # messages per second
+PORTAL_URL = os.environ.get('PORTAL_URL', 'http://localhost:5173')
+
+BATCH_SIZE = 50
+POLL_INTERVAL = 2
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30         # seconds; doubles per attempt, with jitter
+SEND_TIMEOUT = 15
+
+NOTIFICATIONS = REGISTRY.counter('notifications_total', "Notification delivery attempts by outcome")
+OUTBOX_PENDING = REGISTRY.gauge('notification_outbox_pending', "Outbox rows waiting to be sent")
+
+Outgoing = namedtuple('Outgoing', 'id recipient subject body')
+
+
+# ============================
+# OUTBOX (called by the worker)
+# ============================
+
+def _message_text(violation):
+    when = (violation.captured_at or violation.timestamp or datetime.utcnow()).strftime("%d-%m-%Y %H:%M")
+    return (f"e-Challan #{violation.id}: {violation.violation_type} by {violation.vehicle_number} "
+            f"at {violation.location} on {when}. Fine Rs {violation.fine_amount:.0f}. "
+            f"Pay at {PORTAL_URL}")
+
+
+def enqueue_for_violation(violation, vehicle=None):
+    """
+    Adds outbox rows for the vehicle's phone and the emails of users who
+    registered the vehicle. Call before commit; returns the number added.
+    """
+    if vehicle is None and violation.vehicle_number:
+        vehicle = db.session.get(Vehicle, violation.vehicle_number)
+    if vehicle is None:
+        return 0
+
+    recipients = []
+    if vehicle.contact_number:
+        recipients.append(('sms', vehicle.contact_number))
+    for user in User.query.filter_by(vehicle_number=vehicle.vehicle_number).all():
+        recipients.append(('email', user.email))
+
+    text = _message_text(violation)
+    added = 0
+    for channel, recipient in recipients:
+        dedup_key = f"challan:{violation.id}:{channel}:{recipient}"
+        if NotificationOutbox.query.filter_by(dedup_key=dedup_key).first():
+            continue
+        db.session.add(NotificationOutbox(
+            violation_id=violation.id,
+            channel=channel,
+            recipient=recipient,
+            subject=f"e-Challan #{violation.id} issued for {violation.vehicle_number}" if channel == 'email' else None,
+            body=text,
+            dedup_key=dedup_key,
+        ))
+        added += 1
+    return added
+
+
+# ============================
+# SENDERS
+# ============================
+
+class RateLimiter:
+    """Token bucket; acquire(n) waits until n sends are allowed."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, n=1):
+        while n > 0:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            take = min(n, int(self.tokens))
+            if take:
+                self.tokens -= take
+                n -= take
+                continue
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SmsSender:
+    """
+    Posts {"messages": [{"id", "to", "body"}]} to the gateway's batch endpoint,
+    which answers {"results": [{"id", "ok", "error"}]}.
+    """
+    channel = 'sms'
+
+    def __init__(self, url=SMS_GATEWAY_URL, rate=SMS_RATE):
+        self.url = url
+        self.limiter = RateLimiter(rate)
+
+    def _post(self, messages):
+        r = requests.post(self.url, json={"messages": [
+            {"id": m.id, "to": m.recipient, "body": m.body} for m in messages
+        ]}, timeout=SEND_TIMEOUT)
+        r.raise_for_status()
+        results = {res["id"]: (None if res.get("ok") else res.get("error", "rejected"))
+                   for res in r.json().get("results", [])}
+        return {m.id: results.get(m.id, "missing from gateway response") for m in messages}
+
+    async def send_batch(self, messages):
+        """Returns {outbox_id: error or None}."""
+        await self.limiter.acquire(len(messages))
+        try:
+            return await asyncio.to_thread(self._post, messages)
+        except Exception as e:
+            return {m.id: str(e) for m in messages}
+
+
+class EmailSender:
+    """Sends a batch over a single SMTP session."""
+    channel = 'email'
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, sender=SMTP_FROM, rate=EMAIL_RATE):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.limiter = RateLimiter(rate)
+
+    def _send(self, messages):
+        results = {}
+        with smtplib.SMTP(self.host, self.port, timeout=SEND_TIMEOUT) as smtp:
+            for m in messages:
+                msg = EmailMessage()
+                msg['From'] = self.sender
+                msg['To'] = m.recipient
+                msg['Subject'] = m.subject or "e-Challan notification"
+                msg.set_content(m.body)
+                try:
+                    smtp.send_message(msg)
+                    results[m.id] = None
+                except smtplib.SMTPException as e:
+                    results[m.id] = str(e)
+        return results
+
+    async def send_batch(self, messages):
+        await self.limiter.acquire(len(messages))
+        try:
+            return await asyncio.to_thread(self._send, messages)
+        except Exception as e:
+            return {m.id: str(e) for m in messages}
+
+
+# ============================
+# DISPATCHER
+# ============================
+
+def retry_delay(attempts):
+    return RETRY_BASE * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+class NotificationDispatcher:
+    def __init__(self, app, senders, batch_size=BATCH_SIZE):
+        self.app = app
+        self.senders = {s.channel: s for s in senders}
+        self.batch_size = batch_size
+
+    def recover(self):
+        """Rows left 'sending' by a crash are retried (delivery is at-least-once)."""
+        with self.app.app_context():
+            NotificationOutbox.query.filter_by(status='sending').update({"status": "pending"})
+            db.session.commit()
+
+    def _claim(self):
+        with self.app.app_context():
+            now = datetime.utcnow()
+            rows = NotificationOutbox.query.filter(
+                NotificationOutbox.status == 'pending',
+                NotificationOutbox.next_attempt_at <= now
+            ).order_by(NotificationOutbox.next_attempt_at).limit(self.batch_size).all()
+            batches = {}
+            for row in rows:
+                row.status = 'sending'
+                row.attempts = (row.attempts or 0) + 1
+                batches.setdefault(row.channel, []).append(Outgoing(row.id, row.recipient, row.subject, row.body))
+            db.session.commit()
+            OUTBOX_PENDING.set(NotificationOutbox.query.filter_by(status='pending').count())
+            return batches
+
+    def _finish(self, results):
+        with self.app.app_context():
+            now = datetime.utcnow()
+            for row in NotificationOutbox.query.filter(NotificationOutbox.id.in_(results)).all():
+                error = results[row.id]
+                if error is None:
+                    row.status = 'sent'
+                    row.sent_at = now
+                    row.last_error = None
+                    outcome = 'sent'
+                elif row.attempts >= MAX_ATTEMPTS:
+                    row.status = 'dead'
+                    row.last_error = error
+                    outcome = 'dead'
+                else:
+                    row.status = 'pending'
+                    row.last_error = error
+                    row.next_attempt_at = now + timedelta(seconds=retry_delay(row.attempts))
+                    outcome = 'retry'
+                NOTIFICATIONS.inc(channel=row.channel, outcome=outcome)
+            db.session.commit()
+
+    async def run_once(self):
+        """Sends one claimed batch per channel concurrently; returns the number of messages."""
+        batches = self._claim()
+        if not batches:
+            return 0
+        results = {}
+        sends = []
+        for channel, messages in batches.items():
+            sender = self.senders.get(channel)
+            if sender is None:
+                results.update({m.id: f"no sender for {channel}" for m in messages})
+            else:
+                sends.append(sender.send_batch(messages))
+        for outcome in await asyncio.gather(*sends):
+            results.update(outcome)
+        self._finish(results)
+        return len(results)
+
+    async def run(self):
+        self.recover()
+        print(f"[NOTIFY] Dispatcher started for {', '.join(self.senders)}")
+        while True:
+            try:
+                sent = await self.run_once()
+            except Exception as e:
+                print(f"[NOTIFY] Dispatch failed: {e}")
+                sent = 0
+            if not sent:
+                await asyncio.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    from models import create_app
+    from metrics import start_exporter
+    start_exporter("notifier")
+    dispatcher = NotificationDispatcher(create_app(), [SmsSender(), EmailSender()])
+    asyncio.run(dispatcher.run())
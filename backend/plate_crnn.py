@@ -0,0 +1,226 @@
+"""
+Compact CRNN/CTC plate recognizer: training, ONNX export and int8 quantization.
+
+    python plate_crnn.py synth --out crops_synth --count 20000
+    python plate_crnn.py train --data crops_synth crops_real --out models/plate_crnn.pt
+    python plate_crnn.py export --weights models/plate_crnn.pt --out models/plate_crnn.onnx --quantize
+
+Training data is a folder of plate crops. Labels come from labels.csv
+(`file,plate`) when present, otherwise from the file name up to the first
+underscore (`MH12AB1234_03.jpg`). Inference lives in recognizers.py and only
+needs onnxruntime; PyTorch is needed here for training and export.
+"""
+import argparse
+import csv
+import os
+import random
+
+import cv2
+import numpy as np
+
+from recognizers import PLATE_ALPHABET, CRNN_INPUT_SIZE, prepare_crop, ctc_greedy_decode
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STATE_CODES = ('MH', 'KA', 'DL', 'TN', 'GJ', 'UP', 'RJ', 'KL', 'AP', 'TS', 'WB', 'HR', 'PB', 'MP')
+
+
+def build_model(num_classes=len(PLATE_ALPHABET) + 1):
+    import torch.nn as nn
+
+    def block(cin, cout, pool):
+        return [nn.Conv2d(cin, cout, 3, padding=1, bias=False), nn.BatchNorm2d(cout), nn.ReLU(inplace=True),
+                nn.MaxPool2d(pool)]
+
+    class CRNN(nn.Module):
+        # 1x32x128 -> CNN -> 192x1x32 -> 32 time steps -> BiLSTM -> per-step class scores (~0.6M params)
+        def __init__(self):
+            super().__init__()
+            self.cnn = nn.Sequential(
+                *block(1, 32, (2, 2)),      # 16x64
+                *block(32, 64, (2, 2)),     # 8x32
+                *block(64, 128, (2, 1)),    # 4x32
+                *block(128, 192, (4, 1)),   # 1x32
+            )
+            self.rnn = nn.LSTM(192, 96, bidirectional=True, batch_first=False)
+            self.fc = nn.Linear(192, num_classes)
+
+        def forward(self, x):
+            features = self.cnn(x).squeeze(2).permute(2, 0, 1)  # (T, N, 192)
+            out, _ = self.rnn(features)
+            return self.fc(out).log_softmax(2)                 # (T, N, C), CTC layout
+
+    return CRNN()
+
+
+# ============================
+# DATA
+# ============================
+
+def random_plate():
+    """Indian format: state, district, series, number (e.g. MH12AB1234)."""
+    letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    series = ''.join(random.choice(letters) for _ in range(random.choice((1, 2))))
+    return f"{random.choice(STATE_CODES)}{random.randint(1, 99):02d}{series}{random.randint(1, 9999):04d}"
+
+
+def render_plate(text):
+    """Synthetic crop: dark text on a light plate with blur, noise and a slight skew."""
+    h, w = 64, 256
+    background = random.randint(180, 255)
+    img = np.full((h, w), background, dtype=np.uint8)
+    scale = random.uniform(1.2, 1.5)
+    thickness = random.randint(2, 4)
+    font = random.choice((cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_PLAIN))
+    if font == cv2.FONT_HERSHEY_PLAIN:
+        scale *= 2
+    (tw, th), _ = cv2.getTextSize(text, font, scale, thickness)
+    scale *= min(1.0, (w - 16) / tw)
+    (tw, th), _ = cv2.getTextSize(text, font, scale, thickness)
+    org = ((w - tw) // 2 + random.randint(-6, 6), (h + th) // 2 + random.randint(-4, 4))
+    cv2.putText(img, text, org, font, scale, random.randint(0, 70), thickness, cv2.LINE_AA)
+    cv2.rectangle(img, (1, 1), (w - 2, h - 2), 0, random.randint(1, 3))
+
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    jitter = np.float32([[random.uniform(-8, 8), random.uniform(-4, 4)] for _ in range(4)])
+    img = cv2.warpPerspective(img, cv2.getPerspectiveTransform(src, src + jitter), (w, h),
+                              borderMode=cv2.BORDER_REPLICATE)
+    if random.random() < 0.5:
+        img = cv2.GaussianBlur(img, (3, 3), random.uniform(0.3, 1.2))
+    noise = np.random.normal(0, random.uniform(2, 12), img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def load_labelled(folder):
+    """Returns [(path, plate)] for one crop folder."""
+    labels = {}
+    labels_file = os.path.join(folder, 'labels.csv')
+    if os.path.exists(labels_file):
+        with open(labels_file, newline='') as f:
+            for row in csv.DictReader(f):
+                labels[row['file']] = row['plate']
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        plate = labels.get(name, os.path.splitext(name)[0].split('_')[0])
+        plate = ''.join(c for c in plate.upper() if c in PLATE_ALPHABET)
+        if plate:
+            samples.append((os.path.join(folder, name), plate))
+    return samples
+
+
+def encode(plate):
+    return [PLATE_ALPHABET.index(c) + 1 for c in plate]
+
+
+# ============================
+# COMMANDS
+# ============================
+
+def cmd_synth(args):
+    os.makedirs(args.out, exist_ok=True)
+    for i in range(args.count):
+        plate = random_plate()
+        cv2.imwrite(os.path.join(args.out, f"{plate}_{i:06d}.png"), render_plate(plate))
+    print(f"[CRNN] Wrote {args.count} synthetic crops to {args.out}")
+
+
+def cmd_train(args):
+    import torch
+
+    samples = [s for folder in args.data for s in load_labelled(folder)]
+    if not samples:
+        raise SystemExit("No labelled crops found")
+    random.shuffle(samples)
+    split = max(1, len(samples) // 10)
+    val, train = samples[:split], samples[split:]
+    print(f"[CRNN] {len(train)} training / {len(val)} validation crops")
+
+    def load(batch):
+        images = np.stack([prepare_crop(cv2.imread(path, cv2.IMREAD_GRAYSCALE)) for path, _ in batch])
+        targets = [encode(p) for _, p in batch]
+        return (torch.from_numpy(images), torch.tensor(sum(targets, []), dtype=torch.long),
+                torch.tensor([len(t) for t in targets], dtype=torch.long))
+
+    model = build_model()
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    ctc = torch.nn.CTCLoss(blank=0, zero_infinity=True)
+    best = -1.0
+    for epoch in range(1, args.epochs + 1):
+        model.train()
+        random.shuffle(train)
+        total = 0.0
+        for i in range(0, len(train), args.batch_size):
+            images, targets, target_lengths = load(train[i:i + args.batch_size])
+            log_probs = model(images)
+            input_lengths = torch.full((images.shape[0],), log_probs.shape[0], dtype=torch.long)
+            loss = ctc(log_probs, targets, input_lengths, target_lengths)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * images.shape[0]
+
+        model.eval()
+        correct = 0
+        with torch.no_grad():
+            for i in range(0, len(val), args.batch_size):
+                batch = val[i:i + args.batch_size]
+                log_probs = model(load(batch)[0]).numpy()
+                correct += sum(ctc_greedy_decode(log_probs[:, j, :])[0] == plate
+                               for j, (_, plate) in enumerate(batch))
+        accuracy = correct / len(val)
+        print(f"[CRNN] epoch {epoch}: loss {total / len(train):.3f}, val plate accuracy {accuracy:.1%}")
+        if accuracy > best:
+            best = accuracy
+            os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+            torch.save(model.state_dict(), args.out)
+    print(f"[CRNN] Best val accuracy {best:.1%}; weights in {args.out}")
+
+
+def cmd_export(args):
+    import torch
+
+    model = build_model()
+    model.load_state_dict(torch.load(args.weights, map_location='cpu'))
+    model.eval()
+    width, height = CRNN_INPUT_SIZE
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    torch.onnx.export(model, torch.zeros(1, 1, height, width), args.out,
+                      input_names=['image'], output_names=['log_probs'],
+                      dynamic_axes={'image': {0: 'batch'}, 'log_probs': {1: 'batch'}}, opset_version=13)
+    print(f"[CRNN] Exported {args.out} ({os.path.getsize(args.out) / 1e6:.2f} MB)")
+
+    if args.quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized = args.out.replace('.onnx', '.int8.onnx')
+        # Dynamic int8: weights of LSTM/MatMul stored as int8, activations quantized on the fly
+        quantize_dynamic(args.out, quantized, weight_type=QuantType.QInt8)
+        print(f"[CRNN] Quantized {quantized} ({os.path.getsize(quantized) / 1e6:.2f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and export the plate CRNN")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    synth = sub.add_parser('synth', help="Render synthetic plate crops")
+    synth.add_argument('--out', default='crops_synth')
+    synth.add_argument('--count', type=int, default=20000)
+
+    train = sub.add_parser('train', help="Train on labelled crop folders")
+    train.add_argument('--data', nargs='+', required=True)
+    train.add_argument('--out', default='models/plate_crnn.pt')
+    train.add_argument('--epochs', type=int, default=30)
+    train.add_argument('--batch-size', type=int, default=64)
+    train.add_argument('--lr', type=float, default=1e-3)
+
+    export = sub.add_parser('export', help="Export weights to ONNX (optionally int8)")
+    export.add_argument('--weights', default='models/plate_crnn.pt')
+    export.add_argument('--out', default='models/plate_crnn.onnx')
+    export.add_argument('--quantize', action='store_true')
+
+    args = parser.parse_args()
+    {'synth': cmd_synth, 'train': cmd_train, 'export': cmd_export}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import re
+
+# Characters EasyOCR commonly confuses on plates, folded to one "skeleton" symbol
+OCR_CONFUSIONS = {'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5', 'B': '8', 'G': '6'}
+
+MAX_PER_PAGE = 100
+
+# (fts table, source table, rowid column, plate column)
+INDEXES = {
+    'violations': ('violation_plate_fts', 'violation', 'id', 'vehicle_number'),
+    'vehicles': ('vehicle_plate_fts', 'vehicle', 'rowid', 'vehicle_number'),
+}
+
+_fts_available = None
+
+
+def skeleton(text):
+    return ''.join(OCR_CONFUSIONS.get(c, c) for c in text.upper())
+
+
+def _skeleton_sql(expr):
+    # Same folding as skeleton(), in SQL, so triggers keep the index current
+    sql = f"upper({expr})"
+    for src, dst in OCR_CONFUSIONS.items():
+        sql = f"replace({sql}, '{src}', '{dst}')"
+    return sql
+
+
+def ensure_index(db):
+    """
+    Creates the FTS5 trigram tables and sync triggers if missing, and
+    backfills them once. Falls back to plain GLOB scans when this SQLite
+    build has no trigram tokenizer (< 3.34).
+    """
+    global _fts_available
+    conn = db.session.connection()
+    try:
+        for fts, source, rowid, column in INDEXES.values():
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(plate, skeleton, tokenize='trigram')")
+            new_row = f"SELECT new.{rowid}, upper(new.{column}), {_skeleton_sql(f'new.{column}')} WHERE new.{column} IS NOT NULL"
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+                f"INSERT INTO {fts}(rowid, plate, skeleton) {new_row}; END")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {source} BEGIN "
+                f"DELETE FROM {fts} WHERE rowid = old.{rowid}; "
+                f"INSERT INTO {fts}(rowid, plate, skeleton) {new_row}; END")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+                f"DELETE FROM {fts} WHERE rowid = old.{rowid}; END")
+
+            empty = conn.exec_driver_sql(f"SELECT NOT EXISTS (SELECT 1 FROM {fts})").scalar()
+            if empty:
+                conn.exec_driver_sql(
+                    f"INSERT INTO {fts}(rowid, plate, skeleton) "
+                    f"SELECT {rowid}, upper({column}), {_skeleton_sql(column)} FROM {source} WHERE {column} IS NOT NULL")
+        db.session.commit()
+        _fts_available = True
+    except Exception as e:
+        db.session.rollback()
+        print(f"[SEARCH] FTS5 trigram index unavailable, falling back to table scans: {e}")
+        _fts_available = False
+
+
+def parse_query(q):
+    """
+    Turns user input into a GLOB pattern. `*`/`%` match any run, `?`/`_` one
+    character; input without wildcards is treated as a substring search.
+    """
+    q = q.upper().replace('%', '*').replace('_', '?')
+    q = re.sub(r'[^A-Z0-9*?]', '', q)
+    if not q.strip('*?'):
+        return None
+    if '*' not in q and '?' not in q:
+        q = f"*{q}*"
+    return q
+
+
+def _match_expr(pattern, column):
+    # Literal runs of 3+ chars can use the trigram index; shorter runs are left to GLOB
+    runs = [r for r in re.split(r'[*?]+', pattern) if len(r) >= 3]
+    if not runs:
+        return None
+    return " AND ".join(f'{column} : "{r}"' for r in runs)
+
+
+def search(db, q, scope='violations', fuzzy=False, page=1, per_page=25):
+    """
+    Returns ({"rows": [(rowid, plate)], "has_more": bool}) for one index.
+    Results are newest-first (highest rowid).
+    """
+    pattern = parse_query(q)
+    if pattern is None or scope not in INDEXES:
+        return {"rows": [], "has_more": False}
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    offset = (max(1, page) - 1) * per_page
+
+    fts, source, rowid, column = INDEXES[scope]
+    column_name = 'skeleton' if fuzzy else 'plate'
+    if fuzzy:
+        pattern = skeleton(pattern)
+    params = {"glob": pattern, "limit": per_page + 1, "offset": offset}
+    conn = db.session.connection()
+
+    match = _match_expr(pattern, column_name) if _fts_available else None
+    if match:
+        params["match"] = match
+        sql = (f"SELECT rowid, plate FROM {fts} WHERE {fts} MATCH :match AND {column_name} GLOB :glob "
+               f"ORDER BY rowid DESC LIMIT :limit OFFSET :offset")
+    elif _fts_available:
+        sql = (f"SELECT rowid, plate FROM {fts} WHERE {column_name} GLOB :glob "
+               f"ORDER BY rowid DESC LIMIT :limit OFFSET :offset")
+    else:
+        target = _skeleton_sql(column) if fuzzy else f"upper({column})"
+        sql = (f"SELECT {rowid}, upper({column}) FROM {source} WHERE {target} GLOB :glob "
+               f"ORDER BY {rowid} DESC LIMIT :limit OFFSET :offset")
+
+    rows = conn.execute(db.text(sql), params).fetchall()
+    return {"rows": [(r[0], r[1]) for r in rows[:per_page]], "has_more": len(rows) > per_page}
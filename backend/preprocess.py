@@ -0,0 +1,194 @@
+"""
+Batch preprocessing for plate localization.
+
+Frames are stacked into one NumPy array per frame size. Per-pixel steps
+(grayscale conversion, brightness statistics) run once over the whole stack;
+neighbourhood filters, Canny and contour search run per frame on a thread
+pool, which scales because OpenCV releases the GIL.
+
+The cheap path detects on a frame downscaled to `detect_width` and maps the
+plate contour back to full resolution, so OCR still sees full detail.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+DENOISE_METHODS = ('bilateral', 'median', 'guided', 'none')
+CONTOUR_MODES = {
+    'external': 'RETR_EXTERNAL', # outermost contours only
+    'list': 'RETR_LIST',         # every contour, no hierarchy bookkeeping
+    'tree': 'RETR_TREE',         # full hierarchy (the original behaviour)
+}
+MAX_CANDIDATES = 10
+
+
+class PreprocessSettings:
+    """
+    denoise: bilateral | median | guided | none, applied after the downscale.
+    detect_width: width edges/contours are computed at; None keeps full size.
+    clahe: 'auto' equalizes only dark (night) frames, 'always' or 'off'.
+    threads: frames filtered in parallel; opencv_threads sets cv2.setNumThreads.
+    """
+    def __init__(self, denoise='bilateral', detect_width=960, contours='list', clahe='auto',
+                 night_mean=70, clahe_clip=2.0, threads=None, opencv_threads=None):
+        if denoise not in DENOISE_METHODS:
+            raise ValueError(f"denoise must be one of {DENOISE_METHODS}")
+        if contours not in CONTOUR_MODES:
+            raise ValueError(f"contours must be one of {sorted(CONTOUR_MODES)}")
+        self.denoise = denoise
+        self.detect_width = detect_width
+        self.contours = contours
+        self.clahe = clahe
+        self.night_mean = night_mean
+        self.clahe_clip = clahe_clip
+        self.threads = threads or min(4, os.cpu_count() or 1)
+        self.opencv_threads = opencv_threads
+
+    @classmethod
+    def from_env(cls):
+        width = os.environ.get('PREPROCESS_DETECT_WIDTH', '960')
+        cv_threads = os.environ.get('PREPROCESS_OPENCV_THREADS')
+        return cls(
+            denoise=os.environ.get('PREPROCESS_DENOISE', 'bilateral'),
+            detect_width=int(width) if width and width != '0' else None,
+            contours=os.environ.get('PREPROCESS_CONTOURS', 'list'),
+            clahe=os.environ.get('PREPROCESS_CLAHE', 'auto'),
+            threads=int(os.environ.get('PREPROCESS_THREADS', 0)) or None,
+            opencv_threads=int(cv_threads) if cv_threads else None,
+        )
+
+    @classmethod
+    def legacy(cls):
+        """The original single-frame pipeline: full-size bilateral(11) + RETR_TREE."""
+        return cls(denoise='bilateral', detect_width=None, contours='tree', clahe='off')
+
+    def describe(self):
+        return (f"denoise={self.denoise} detect_width={self.detect_width or 'full'} contours={self.contours} "
+                f"clahe={self.clahe} threads={self.threads} opencv_threads={self.opencv_threads}")
+
+
+def stack_frames(frames):
+    """Groups frames by shape: {shape: (indices, array of shape (N, H, W[, C]))}."""
+    groups = {}
+    for i, frame in enumerate(frames):
+        groups.setdefault(frame.shape, []).append(i)
+    return {shape: (idx, np.stack([frames[i] for i in idx])) for shape, idx in groups.items()}
+
+
+def to_gray(batch):
+    """(N, H, W, 3) BGR -> (N, H, W) gray in one cvtColor call over the stacked rows."""
+    if batch.ndim == 3:
+        return batch
+    n, h, w, _ = batch.shape
+    return cv2.cvtColor(batch.reshape(n * h, w, 3), cv2.COLOR_BGR2GRAY).reshape(n, h, w)
+
+
+def night_mask(gray, settings):
+    if settings.clahe == 'always':
+        return np.ones(len(gray), dtype=bool)
+    if settings.clahe == 'off':
+        return np.zeros(len(gray), dtype=bool)
+    # Mean brightness of every frame at once, on a strided view (every 4th pixel is plenty)
+    return gray[:, ::4, ::4].mean(axis=(1, 2)) < settings.night_mean
+
+
+def guided_filter(image, radius=4, eps=0.02):
+    """Self-guided edge-preserving smoothing built from box filters."""
+    if hasattr(cv2, 'ximgproc'):
+        return cv2.ximgproc.guidedFilter(image, image, radius, eps * 255 * 255)
+    src = image.astype(np.float32) / 255.0
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean = cv2.boxFilter(src, -1, ksize)
+    var = cv2.boxFilter(src * src, -1, ksize) - mean * mean
+    a = var / (var + eps)
+    b = mean - a * mean
+    out = cv2.boxFilter(a, -1, ksize) * src + cv2.boxFilter(b, -1, ksize)
+    return np.clip(out * 255.0, 0, 255).astype(np.uint8)
+
+
+def denoise(image, settings, scale):
+    if settings.denoise == 'bilateral':
+        # Keep the original 11px footprint relative to the frame, so smaller frames use smaller kernels
+        d = max(5, int(11 * scale) | 1)
+        return cv2.bilateralFilter(image, d, 17, 17)
+    if settings.denoise == 'median':
+        return cv2.medianBlur(image, 5)
+    if settings.denoise == 'guided':
+        return guided_filter(image)
+    return image
+
+
+def locate(gray, settings):
+    """Finds the largest 4-sided contour; returns it in full-resolution coordinates or None."""
+    h, w = gray.shape
+    scale = 1.0
+    small = gray
+    if settings.detect_width and w > settings.detect_width:
+        scale = settings.detect_width / float(w)
+        small = cv2.resize(gray, (settings.detect_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    filtered = denoise(small, settings, scale)
+    edged = cv2.Canny(filtered, 30, 200)
+    contours, _ = cv2.findContours(edged, getattr(cv2, CONTOUR_MODES[settings.contours]), cv2.CHAIN_APPROX_SIMPLE)
+    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:MAX_CANDIDATES]
+
+    epsilon = max(2.0, 10 * scale) # the original 10px tolerance, at detection scale
+    for contour in contours:
+        approx = cv2.approxPolyDP(contour, epsilon, True)
+        if len(approx) == 4:
+            if scale != 1.0:
+                approx = np.round(approx / scale).astype(np.int32)
+            return approx
+    return None
+
+
+class Preprocessor:
+    """Reusable worker pool + CLAHE object for a given PreprocessSettings."""
+    def __init__(self, settings=None):
+        self.settings = settings or PreprocessSettings.from_env()
+        if self.settings.opencv_threads is not None:
+            cv2.setNumThreads(self.settings.opencv_threads)
+        self.clahe = cv2.createCLAHE(clipLimit=self.settings.clahe_clip, tileGridSize=(8, 8))
+        self.pool = ThreadPoolExecutor(max_workers=self.settings.threads, thread_name_prefix="preprocess") \
+            if self.settings.threads > 1 else None
+
+    def _map(self, fn, items):
+        if self.pool is None or len(items) == 1:
+            return [fn(item) for item in items]
+        return list(self.pool.map(fn, items))
+
+    def run(self, frames):
+        """
+        Returns [(gray, location)] in input order. `gray` is full resolution
+        (contrast-normalized for night frames) and is what OCR should read;
+        `location` is the plate contour or None.
+        """
+        results = [None] * len(frames)
+        for _, (indices, batch) in stack_frames(frames).items():
+            gray = to_gray(batch)
+            dark = night_mask(gray, self.settings)
+            if dark.any():
+                gray = gray.copy() if gray is batch else gray
+                for i in np.flatnonzero(dark):
+                    gray[i] = self.clahe.apply(gray[i])
+            locations = self._map(lambda g: locate(g, self.settings), list(gray))
+            for i, frame_idx in enumerate(indices):
+                results[frame_idx] = (gray[i], locations[i])
+        return results
+
+    def run_one(self, frame):
+        return self.run([frame])[0]
+
+
+_default = None
+
+
+def get_preprocessor():
+    global _default
+    if _default is None:
+        _default = Preprocessor()
+    return _default
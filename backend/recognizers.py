@@ -0,0 +1,110 @@
+"""
+Plate text recognizers behind one interface.
+
+Every recognizer exposes readtext(image) -> [(bbox, text, confidence)], the
+same shape easyocr.Reader.readtext returns, so callers can switch without
+other changes. Pick one with ANPR_RECOGNIZER=easyocr|crnn or by name in
+get_recognizer().
+"""
+import os
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+DEFAULT_RECOGNIZER = os.environ.get('ANPR_RECOGNIZER', 'easyocr')
+CRNN_MODEL = os.environ.get('CRNN_MODEL', 'models/plate_crnn.int8.onnx')
+
+# CTC classes: index 0 is the blank, then the 36 plate characters
+PLATE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CRNN_INPUT_SIZE = (128, 32) # width, height
+
+
+class EasyOCRRecognizer:
+    """General-purpose detector + recognizer; works on full frames as well as crops."""
+    name = 'easyocr'
+    needs_crop = False
+
+    def __init__(self, languages=('en',), gpu=False):
+        import easyocr
+        self.reader = easyocr.Reader(list(languages), gpu=gpu)
+
+    def readtext(self, image):
+        return self.reader.readtext(image)
+
+
+def ctc_greedy_decode(log_probs, alphabet=PLATE_ALPHABET):
+    """
+    log_probs: (T, C) array. Takes the best class per step, merges repeats and
+    drops blanks. Returns (text, confidence) with confidence the mean max
+    probability over the emitted characters.
+    """
+    best = log_probs.argmax(axis=1)
+    probs = np.exp(log_probs.max(axis=1))
+    chars, scores = [], []
+    previous = 0
+    for step, cls in enumerate(best):
+        if cls != 0 and cls != previous:
+            chars.append(alphabet[cls - 1])
+            scores.append(probs[step])
+        previous = cls
+    return "".join(chars), float(np.mean(scores)) if scores else 0.0
+
+
+def prepare_crop(image, size=CRNN_INPUT_SIZE):
+    """Gray, resized, scaled to [-1, 1]; shape (1, H, W) float32."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return ((image.astype(np.float32) / 127.5) - 1.0)[None, :, :]
+
+
+class CRNNRecognizer:
+    """
+    Compact CRNN/CTC model for single-line plate crops, run with ONNX Runtime
+    on CPU (see plate_crnn.py for training, export and int8 quantization).
+    It reads one line per call, so it expects a localized plate crop rather
+    than a whole frame.
+    """
+    name = 'crnn'
+    needs_crop = True
+
+    def __init__(self, model_path=CRNN_MODEL, threads=1):
+        import onnxruntime as ort
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"CRNN model not found at {model_path}; build it with plate_crnn.py")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def read_batch(self, crops):
+        """Recognizes several crops in one session run; returns [(text, confidence)]."""
+        if not crops:
+            return []
+        batch = np.stack([prepare_crop(c) for c in crops])
+        log_probs = self.session.run(None, {self.input_name: batch})[0] # (T, N, C)
+        return [ctc_greedy_decode(log_probs[:, i, :]) for i in range(len(crops))]
+
+    def readtext(self, image):
+        h, w = image.shape[:2]
+        text, confidence = self.read_batch([image])[0]
+        if not text:
+            return []
+        return [([[0, 0], [w, 0], [w, h], [0, h]], text, confidence)]
+
+
+RECOGNIZERS = {
+    'easyocr': EasyOCRRecognizer,
+    'crnn': CRNNRecognizer,
+}
+
+
+def get_recognizer(name=None, **kwargs):
+    name = name or DEFAULT_RECOGNIZER
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer {name}; choose from {sorted(RECOGNIZERS)}")
+    print(f"[OCR] Loading {name} recognizer...")
+    return RECOGNIZERS[name](**kwargs)
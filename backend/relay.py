@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+from lazy_imports import lazy_import
+from video_codec import CaptureSettings, open_capture
+from metrics import REGISTRY
+
+cv2 = lazy_import('cv2')
+
+RELAY_WIDTH = 640          # preview is downscaled to this width before encoding
+RELAY_JPEG_QUALITY = 70
+DETECT_EVERY = 5           # run the plate cascade on every Nth frame, reuse boxes in between
+IDLE_TIMEOUT = 30          # seconds without viewers before the camera connection is closed
+READ_TIMEOUT = 5           # seconds without a frame before a stalled camera is reconnected
+RECONNECT_DELAY = 3
+CASCADE_PATH = 'haarcascade_plate.xml'
+
+RELAY_VIEWERS = REGISTRY.gauge('relay_viewers', "Connected preview viewers per camera")
+RELAY_FRAMES = REGISTRY.counter('relay_frames_total', "Frames decoded and encoded by the preview relay")
+RELAY_DROPPED = REGISTRY.counter('relay_frames_dropped_total', "Frames skipped by slow preview viewers")
+
+
+class CameraRelay:
+    """
+    Decodes one camera stream once and publishes a downscaled JPEG of the
+    latest frame. Viewers always take the newest frame, so a slow client just
+    skips frames instead of holding up the decoder or other viewers.
+    """
+    def __init__(self, camera_id, source):
+        self.camera_id = camera_id
+        self.source = source
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.jpeg = None
+        self.viewers = 0
+        self.last_viewer_at = time.time()
+        self.running = False
+        self.thread = None
+        self.fps = 0.0
+        self.plate_cascade = cv2.CascadeClassifier(CASCADE_PATH) if os.path.exists(CASCADE_PATH) else None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=f"relay-cam-{self.camera_id}", daemon=True)
+            self.thread.start()
+
+    def _detect_boxes(self, small):
+        if self.plate_cascade is None:
+            return []
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return self.plate_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(20, 20))
+
+    def _idle(self):
+        return self.viewers == 0 and time.time() - self.last_viewer_at > IDLE_TIMEOUT
+
+    def _run(self):
+        print(f"[RELAY] Starting relay for camera {self.camera_id}: {self.source}")
+        while self.running:
+            if self._idle():
+                # Nobody watching: release the camera connection
+                self.running = False
+                break
+            # Decoding on its own thread lets a stalled camera be given up on: read() has a deadline
+            cap = open_capture(self.source, CaptureSettings(buffer_size=1, queue_size=2, read_timeout=READ_TIMEOUT))
+            if not cap.isOpened():
+                time.sleep(RECONNECT_DELAY)
+                continue
+
+            boxes = []
+            frame_idx = 0
+            window_start, window_frames = time.time(), 0
+            while self.running:
+                ret, frame = cap.read(timeout=READ_TIMEOUT)
+                if not ret:
+                    print(f"[RELAY] Camera {self.camera_id} stopped sending frames, reconnecting")
+                    break
+
+                h, w = frame.shape[:2]
+                if w > RELAY_WIDTH:
+                    frame = cv2.resize(frame, (RELAY_WIDTH, int(h * RELAY_WIDTH / float(w))), interpolation=cv2.INTER_AREA)
+                if frame_idx % DETECT_EVERY == 0:
+                    boxes = self._detect_boxes(frame)
+                for (x, y, bw, bh) in boxes:
+                    cv2.rectangle(frame, (x, y), (x + bw, y + bh), (0, 255, 0), 2)
+
+                # Encode once; every viewer receives these same bytes
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, RELAY_JPEG_QUALITY])
+                if ok:
+                    with self.condition:
+                        self.jpeg = buf.tobytes()
+                        self.seq += 1
+                        self.condition.notify_all()
+                    RELAY_FRAMES.inc(camera=self.camera_id)
+
+                frame_idx += 1
+                window_frames += 1
+                if time.time() - window_start >= 1.0:
+                    self.fps = window_frames / (time.time() - window_start)
+                    window_start, window_frames = time.time(), 0
+
+                if self._idle():
+                    self.running = False
+
+            cap.release()
+            if self.running:
+                time.sleep(RECONNECT_DELAY)
+        print(f"[RELAY] Stopped relay for camera {self.camera_id}")
+
+    def frames(self):
+        """multipart/x-mixed-replace generator for one viewer."""
+        with self.condition:
+            self.viewers += 1
+        RELAY_VIEWERS.set(self.viewers, camera=self.camera_id)
+        last_seq = 0
+        try:
+            while self.running:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.seq > last_seq or not self.running, timeout=5)
+                    if self.seq <= last_seq:
+                        continue
+                    if last_seq and self.seq - last_seq > 1:
+                        RELAY_DROPPED.inc(self.seq - last_seq - 1, camera=self.camera_id)
+                    last_seq, jpeg = self.seq, self.jpeg
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                       + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+        finally:
+            with self.condition:
+                self.viewers -= 1
+                self.last_viewer_at = time.time()
+            RELAY_VIEWERS.set(self.viewers, camera=self.camera_id)
+
+
+class RelayManager:
+    """Keeps at most one relay per camera, shared by all viewers."""
+    def __init__(self):
+        self.relays = {}
+        self.lock = threading.Lock()
+
+    def get(self, camera_id, source):
+        with self.lock:
+            relay = self.relays.get(camera_id)
+            if relay is None or not relay.running or relay.source != source:
+                if relay is not None:
+                    relay.running = False # camera URL changed: retire the old decoder
+                relay = self.relays[camera_id] = CameraRelay(camera_id, source)
+                relay.start()
+            # Counts as activity so the relay is not torn down before the viewer attaches
+            relay.last_viewer_at = time.time()
+            return relay
+
+    def stats(self, camera_id):
+        relay = self.relays.get(camera_id)
+        if relay is None or not relay.running:
+            return {"viewers": 0, "fps": 0.0, "running": False}
+        return {"viewers": relay.viewers, "fps": round(relay.fps, 1), "running": True}
+
+
+def camera_source(ip_address, template):
+    """
+    Camera.ip_address may hold a full stream URL, a webcam index, or a bare IP
+    that is expanded with `template` (e.g. 'http://{ip}:4747/video').
+    """
+    if not ip_address:
+        return None
+    if '://' in ip_address:
+        return ip_address
+    if ip_address.isdigit():
+        return int(ip_address)
+    return template.format(ip=ip_address)
@@ -0,0 +1,218 @@
+"""
+Response cache for the read-heavy dashboard endpoints.
+
+A cached view's key is its endpoint, arguments and caller plus the current
+data version of everything the payload depends on, so a write never has to
+find and delete stale entries: it moves a version on and the next request
+misses. Every violation change (upload, worker, backfill, payment, and the
+compactor repointing or purging evidence) appends a ViolationEvent in its
+own transaction, so the newest event id is the 'violations' version. Other scopes keep a counter in CacheVersion that
+writers move with bump_version() before they commit. The per-endpoint TTL
+bounds how long anything that changes with the clock (today's counts) lags.
+
+Responses carry a strong ETag (hash of the body) and a matching
+If-None-Match gets a 304 without a body.
+
+RESPONSE_CACHE=memory (per process, the default), sqlite (one local file,
+RESPONSE_CACHE_PATH, shared by every API process on the host) or off.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import text
+
+import metrics
+from models import db, CacheVersion, ViolationEvent
+
+CACHE_BACKEND = os.environ.get('RESPONSE_CACHE', 'memory')
+CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', 'instance/response_cache.db')
+MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_ENTRIES', 2000))
+PRUNE_EVERY = 200 # sqlite backend: drop expired rows once per this many writes
+
+
+# ============================
+# VERSIONS
+# ============================
+
+def bump_version(scope):
+    """Invalidates everything cached for `scope`. Call before commit so it lands with the write."""
+    db.session.execute(text(
+        "INSERT INTO cache_version (scope, version) VALUES (:scope, 1) "
+        "ON CONFLICT(scope) DO UPDATE SET version = version + 1"
+    ), {"scope": scope})
+
+
+def data_versions(scopes):
+    """{scope: version} for the given scopes, in at most two small queries."""
+    versions = {}
+    if 'violations' in scopes:
+        versions['violations'] = db.session.query(db.func.max(ViolationEvent.id)).scalar() or 0
+    others = [s for s in scopes if s != 'violations']
+    if others:
+        found = dict(db.session.query(CacheVersion.scope, CacheVersion.version)
+                     .filter(CacheVersion.scope.in_(others)).all())
+        for scope in others:
+            versions[scope] = found.get(scope, 0)
+    return versions
+
+
+# ============================
+# BACKENDS
+# ============================
+
+class MemoryBackend:
+    """LRU dict for a single process."""
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key -> (etag, body, expires_at)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key, etag, body, ttl):
+        with self.lock:
+            self.entries[key] = (etag, body, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class SqliteBackend:
+    """
+    One table in a local SQLite file. WAL lets every API process read while
+    another writes; a locked or broken file is treated as a miss, never an error.
+    """
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=1.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS response_cache ("
+                     "key TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, expires_at REAL NOT NULL)")
+        conn.commit()
+        conn.close()
+
+    def _conn(self):
+        # One connection per thread, and never one inherited across fork
+        conn, pid = getattr(self.local, 'conn', (None, None))
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = (conn, os.getpid())
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute("SELECT etag, body FROM response_cache WHERE key = ? AND expires_at > ?",
+                                       (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            print(f"[CACHE] Read failed: {e}")
+            return None
+        return (row[0], bytes(row[1])) if row else None
+
+    def set(self, key, etag, body, ttl):
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, etag, body, expires_at) VALUES (?, ?, ?, ?)",
+                         (key, etag, body, time.time() + ttl))
+            self.writes += 1
+            if self.writes % PRUNE_EVERY == 0:
+                self._prune(conn)
+        except sqlite3.Error as e:
+            print(f"[CACHE] Write failed: {e}")
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        # Still over the limit: drop the entries closest to expiry
+        conn.execute("DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache "
+                     "ORDER BY expires_at LIMIT max(0, (SELECT count(*) FROM response_cache) - ?))",
+                     (self.max_entries,))
+
+
+def make_backend(name=CACHE_BACKEND):
+    if name == 'off':
+        return None
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SqliteBackend()
+    raise ValueError(f"RESPONSE_CACHE must be memory, sqlite or off, not {name}")
+
+
+# ============================
+# VIEW DECORATOR
+# ============================
+
+class ResponseCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @classmethod
+    def from_env(cls):
+        backend = make_backend()
+        print(f"[CACHE] Response cache: {CACHE_BACKEND}")
+        return cls(backend)
+
+    def cached(self, ttl, depends, principal):
+        """
+        ttl: seconds an entry may be served while its versions are unchanged.
+        depends: scopes whose versions are part of the key ('violations', 'cameras', 'vehicles').
+        principal: returns a string identifying who the payload is for, or
+        None when the caller isn't allowed, in which case the view runs
+        uncached and answers for itself (401). Only 200 JSON responses are stored.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                who = principal()
+                if who is None:
+                    return view(*args, **kwargs)
+
+                key_parts = [request.endpoint, json.dumps(kwargs, sort_keys=True),
+                             request.query_string.decode(), who, json.dumps(data_versions(depends), sort_keys=True)]
+                key = hashlib.sha256("|".join(key_parts).encode()).hexdigest()
+
+                entry = self.backend.get(key)
+                metrics.cache_result('response', entry is not None)
+                if entry is not None:
+                    etag, body = entry
+                    response = current_app.response_class(body, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.mimetype != 'application/json':
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha256(body).hexdigest()[:32]
+                    self.backend.set(key, etag, body, ttl)
+                    response.headers['X-Cache'] = 'MISS'
+
+                response.set_etag(etag) # strong: same bytes, same tag
+                # Browsers keep the body but revalidate every time, which costs a 304
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -0,0 +1,155 @@
+import heapq
+import time
+import threading
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+# Highest priority first
+PRIORITY_CLASSES = ('live', 'reupload', 'backfill')
+DEFAULT_CLASS = 'live'
+
+# Upper bound on in-memory jobs per class; the rest stay 'pending' in the DB until there is room
+MAX_QUEUED = {'live': 5000, 'reupload': 2000, 'backfill': 500}
+# Every Nth pick goes to a lower class (if any) so re-uploads/backfill still trickle through
+LOWER_CLASS_SHARE = 10
+# Section-speed cameras share one lane, served in capture order across cameras, so an
+# upstream sighting is always processed before the downstream one it pairs with
+SECTION_LANE = 'section'
+# Seconds a section job is held after capture, so a slightly later upload from the
+# other end of the segment can still be slotted in ahead of it
+SECTION_HOLD = 5
+
+# Degradation thresholds on how long the longest-waiting live job has been queued
+# (seconds since enqueue, not since capture: a late upload of an old frame is not overload)
+LIVE_TARGET_AGE = 30
+DEGRADE_LEVELS = (
+    (0, {"full_frame_ocr": True, "max_width": None}),  # normal
+    (1, {"full_frame_ocr": False, "max_width": None}), # skip the whole-image OCR fallback
+    (2, {"full_frame_ocr": False, "max_width": 960}),  # also detect on a downscaled frame
+)
+
+QUEUE_DEPTH = REGISTRY.gauge('anpr_scheduler_queue_depth', "Queued jobs per priority class")
+QUEUE_AGE = REGISTRY.gauge('anpr_scheduler_queue_age_seconds', "Longest time a queued job has waited per priority class")
+DEGRADE_LEVEL = REGISTRY.gauge('anpr_degrade_level', "0 = full quality, higher = cheaper processing under overload")
+REJECTED = REGISTRY.counter('anpr_scheduler_rejected_total', "Jobs left in the DB because the class queue was full")
+SHED = REGISTRY.counter('anpr_scheduler_shed_total', "Picks where backfill was skipped due to overload")
+
+
+class Job:
+    def __init__(self, violation_id, priority_class, camera_id, created_at, section=False):
+        self.violation_id = violation_id
+        self.priority_class = priority_class if priority_class in PRIORITY_CLASSES else DEFAULT_CLASS
+        self.camera_id = camera_id
+        self.created_at = created_at # unix time the frame was captured / uploaded
+        self.lane = SECTION_LANE if section else camera_id
+
+    def __lt__(self, other):
+        # Lanes are heaps: oldest capture first
+        return (self.created_at, self.violation_id) < (other.created_at, other.violation_id)
+
+
+class PipelineScheduler:
+    """
+    Priority classes with per-camera round robin inside each class. Each
+    lane is served in capture order; section-speed cameras share a lane.
+
+    Jobs are picked strictly by class, except that every LOWER_CLASS_SHARE-th
+    pick is offered to lower classes so they never starve completely. When
+    live jobs wait in the queue past LIVE_TARGET_AGE the degrade level rises, which makes
+    each job cheaper, and backfill is paused until live work catches up.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # class -> OrderedDict(lane -> heap of Jobs); lane order rotates for fairness
+        self.queues = {c: OrderedDict() for c in PRIORITY_CLASSES}
+        self.counts = {c: 0 for c in PRIORITY_CLASSES}
+        self.queued_ids = set()
+        # class -> OrderedDict(violation_id -> enqueue time), oldest first
+        self.waiting = {c: OrderedDict() for c in PRIORITY_CLASSES}
+        self.picks = 0
+
+    def enqueue(self, job):
+        with self.lock:
+            if job.violation_id in self.queued_ids:
+                return True
+            if self.counts[job.priority_class] >= MAX_QUEUED[job.priority_class]:
+                REJECTED.inc(priority_class=job.priority_class)
+                return False
+            heapq.heappush(self.queues[job.priority_class].setdefault(job.lane, []), job)
+            self.counts[job.priority_class] += 1
+            self.queued_ids.add(job.violation_id)
+            self.waiting[job.priority_class][job.violation_id] = time.time()
+            return True
+
+    def _pop_class(self, priority_class):
+        lanes = self.queues[priority_class]
+        held_until = time.time() - SECTION_HOLD
+        ready = next((lane for lane, jobs in lanes.items()
+                      if lane != SECTION_LANE or jobs[0].created_at <= held_until), None)
+        if ready is None:
+            return None
+        jobs = lanes[ready]
+        job = heapq.heappop(jobs)
+        if jobs:
+            lanes.move_to_end(ready) # next pick serves the next camera
+        else:
+            del lanes[ready]
+        self.counts[priority_class] -= 1
+        self.queued_ids.discard(job.violation_id)
+        self.waiting[priority_class].pop(job.violation_id, None)
+        return job
+
+    def next(self):
+        with self.lock:
+            self.picks += 1
+            level = self._degrade_level()
+            order = list(PRIORITY_CLASSES)
+            if self.picks % LOWER_CLASS_SHARE == 0:
+                order = order[1:] + order[:1]
+            for priority_class in order:
+                if priority_class == 'backfill' and level > 0:
+                    if self.counts['backfill']:
+                        SHED.inc()
+                    continue
+                job = self._pop_class(priority_class)
+                if job:
+                    return job
+            return None
+
+    def _oldest_age(self, priority_class, now=None):
+        waiting = self.waiting[priority_class]
+        if not waiting:
+            return 0.0
+        return (now or time.time()) - next(iter(waiting.values()))
+
+    def _degrade_level(self):
+        age = self._oldest_age('live')
+        if age > 2 * LIVE_TARGET_AGE:
+            return 2
+        if age > LIVE_TARGET_AGE:
+            return 1
+        return 0
+
+    def processing_options(self):
+        """Options for extract_plate_text() at the current load level."""
+        with self.lock:
+            level = self._degrade_level()
+        return level, DEGRADE_LEVELS[level][1]
+
+    def __len__(self):
+        return len(self.queued_ids)
+
+    def export_metrics(self):
+        with self.lock:
+            now = time.time()
+            for priority_class in PRIORITY_CLASSES:
+                QUEUE_DEPTH.set(self.counts[priority_class], priority_class=priority_class)
+                QUEUE_AGE.set(self._oldest_age(priority_class, now), priority_class=priority_class)
+            DEGRADE_LEVEL.set(self._degrade_level())
+
+    def stats(self):
+        with self.lock:
+            now = time.time()
+            return {c: {"depth": self.counts[c], "oldest_age_s": round(self._oldest_age(c, now), 1)}
+                    for c in PRIORITY_CLASSES}
@@ -0,0 +1,219 @@
+import io
+import os
+import re
+import hashlib
+import shutil
+import tempfile
+import mimetypes
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Blob
+
+# Sharded layout: blobs/ab/cd/<sha256>.<ext>
+BLOB_PREFIX = 'blobs'
+CHUNK_SIZE = 1024 * 1024
+BLOB_REF_RE = re.compile(r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def blob_ref(digest, ext):
+    ext = (ext or '').lower().lstrip('.')
+    name = f"{digest}.{ext}" if ext else digest
+    return "/".join([BLOB_PREFIX, digest[:2], digest[2:4], name])
+
+
+def is_blob_ref(path):
+    return bool(path) and path.replace('\\', '/').startswith(BLOB_PREFIX + '/')
+
+
+def is_valid_ref(ref):
+    """True for refs blob_ref() can produce; anything else (e.g. `..`) is rejected."""
+    return bool(BLOB_REF_RE.match(ref or ''))
+
+
+def digest_from_ref(ref):
+    return os.path.basename(ref).split('.', 1)[0]
+
+
+def _spool(stream):
+    """
+    Copies a stream into a temp file while hashing it, so large videos are
+    never held in memory. Returns (digest, size, temp_path).
+    """
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(prefix='blob_')
+    with os.fdopen(fd, 'wb') as out:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sha.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size, tmp_path
+
+
+class BlobStore:
+    """
+    Interface for evidence storage. Objects are addressed by the SHA-256 of
+    their original content, so writing the same bytes twice stores them once.
+    """
+    def exists(self, ref):
+        raise NotImplementedError
+
+    def _store_file(self, tmp_path, ref):
+        raise NotImplementedError
+
+    def delete(self, ref):
+        raise NotImplementedError
+
+    def local_path(self, ref):
+        """Returns a filesystem path OpenCV can read for the object."""
+        raise NotImplementedError
+
+    def put_stream(self, stream, ext):
+        """
+        Stores a file-like object. Returns (ref, digest, size, created) where
+        `created` is False when identical content was already present.
+        """
+        digest, size, tmp_path = _spool(stream)
+        ref = blob_ref(digest, ext)
+        try:
+            if self.exists(ref):
+                return ref, digest, size, False
+            self._store_file(tmp_path, ref)
+            return ref, digest, size, True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_path(self, path):
+        with open(path, 'rb') as f:
+            return self.put_stream(f, os.path.splitext(path)[1])
+
+    def put_bytes(self, data, ext):
+        return self.put_stream(io.BytesIO(data), ext)
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root='.'):
+        self.root = root
+
+    def _full_path(self, ref):
+        root = os.path.abspath(self.root)
+        path = os.path.abspath(os.path.join(root, *ref.replace('\\', '/').split('/')))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Blob ref escapes the store root: {ref}")
+        return path
+
+    def exists(self, ref):
+        return os.path.exists(self._full_path(ref))
+
+    def _store_file(self, tmp_path, ref):
+        dest = self._full_path(ref)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # Copy next to the destination then rename, so readers never see partial blobs
+        staging = f"{dest}.{os.getpid()}.tmp"
+        shutil.copyfile(tmp_path, staging)
+        os.replace(staging, dest)
+
+    def delete(self, ref):
+        path = self._full_path(ref)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def local_path(self, ref):
+        return self._full_path(ref)
+
+
+class S3BlobStore(BlobStore):
+    """
+    S3-compatible backend. `endpoint_url` lets it run against a local stand-in
+    such as MinIO (e.g. http://localhost:9000) during development.
+    """
+    def __init__(self, bucket, endpoint_url=None, cache_dir='blob_cache'):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("boto3 is required for the S3 blob backend (pip install boto3)")
+        from botocore.exceptions import ClientError
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.cache = LocalBlobStore(cache_dir)
+
+    def exists(self, ref):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=ref)
+            return True
+        except self._client_error:
+            return False
+
+    def _store_file(self, tmp_path, ref):
+        content_type = mimetypes.guess_type(ref)[0] or 'application/octet-stream'
+        self.client.upload_file(tmp_path, self.bucket, ref, ExtraArgs={'ContentType': content_type})
+
+    def delete(self, ref):
+        self.client.delete_object(Bucket=self.bucket, Key=ref)
+        self.cache.delete(ref)
+
+    def local_path(self, ref):
+        # Objects are immutable until tiered, so a local read-through copy is safe
+        path = self.cache.local_path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staging = f"{path}.{os.getpid()}.tmp"
+            self.client.download_file(self.bucket, ref, staging)
+            os.replace(staging, path)
+        return path
+
+
+_store = None
+
+def get_blob_store():
+    """
+    Returns the configured store. BLOB_BACKEND=s3 selects S3 using S3_BUCKET
+    and optional S3_ENDPOINT_URL; anything else uses the local filesystem.
+    """
+    global _store
+    if _store is None:
+        if os.environ.get('BLOB_BACKEND', 'local').lower() == 's3':
+            _store = S3BlobStore(
+                bucket=os.environ.get('S3_BUCKET', 'echallan-evidence'),
+                endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+            )
+        else:
+            _store = LocalBlobStore(os.environ.get('BLOB_ROOT', '.'))
+    return _store
+
+
+def resolve_path(path):
+    """
+    Maps a Violation path to something readable on disk. Blob refs go through
+    the store; legacy `uploads/...` paths are returned unchanged.
+    """
+    if is_blob_ref(path):
+        return get_blob_store().local_path(path)
+    return path
+
+
+def record_blob(session, ref, digest, size):
+    """
+    Registers a stored object in the Blob table. A purged blob whose bytes
+    were stored again starts over as hot, so the compactor tiers it again.
+    """
+    blob = session.get(Blob, digest)
+    if blob is None:
+        # Two identical uploads can race here; the loser's insert is a no-op
+        session.execute(insert(Blob).values(
+            sha256=digest, ref=ref, size=size, content_type=mimetypes.guess_type(ref)[0],
+            tier='hot', created_at=datetime.utcnow(),
+        ).on_conflict_do_nothing(index_elements=['sha256']))
+    elif blob.tier == 'purged':
+        blob.ref = ref
+        blob.size = size
+        blob.tier = 'hot'
+        blob.created_at = datetime.utcnow()
+        blob.tiered_at = None
@@ -0,0 +1,131 @@
+"""
+Pre-forking supervisor for OCR workers.
+
+    python supervisor.py --workers 2
+
+The parent pays for everything slow exactly once: imports, the Flask app,
+and the OCR model weights. It then forks the workers, which share those
+pages copy-on-write, and each child takes its own slice of the pending rows
+(violation id modulo the worker count). Rows from section-speed cameras all
+go to the first child, since sightings only pair inside one process. When a child exits it is replaced
+by a fresh fork of the warm parent, so a restart takes milliseconds instead
+of the seconds a cold `python worker.py` needs to load EasyOCR.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+
+RESPAWN_BACKOFF = 5     # seconds to wait before replacing a child that died right after starting
+MIN_CHILD_LIFETIME = 2  # a child exiting sooner than this counts as a crash loop
+
+
+def _limit_torch_threads(threads):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+class Supervisor:
+    def __init__(self, workers, recognizer=None, torch_threads=1):
+        self.workers = workers
+        self.recognizer_name = recognizer
+        self.torch_threads = torch_threads
+        self.children = {} # pid -> (shard index, started at)
+        self.stopping = False
+
+    def preload(self):
+        start = time.perf_counter()
+        # A single intra-op thread in the parent keeps torch from starting an
+        # OpenMP pool before fork, which children could deadlock on
+        _limit_torch_threads(1)
+        from lazy_imports import preload
+        from models import db, create_app
+        import worker
+        from recognizers import get_recognizer
+
+        self.app = create_app()
+        self.reader = get_recognizer(self.recognizer_name)
+        preload() # resolve every lazy cv2/numpy placeholder now
+        with self.app.app_context():
+            db.engine.dispose() # children open their own connections
+        self.worker = worker
+        # Move everything loaded so far out of the GC's view, so collections in
+        # the children don't write to (and un-share) these pages
+        gc.collect()
+        gc.freeze()
+        print(f"[SUPERVISOR] Preloaded app and {self.reader.name} recognizer in {time.perf_counter() - start:.2f}s")
+
+    def spawn(self, index):
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (index, time.time())
+            return pid
+
+        # Child
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        _limit_torch_threads(self.torch_threads)
+        code = 0
+        try:
+            print(f"[SUPERVISOR] Worker {index} (pid {os.getpid()}) ready in "
+                  f"{(time.perf_counter() - forked_at) * 1000:.0f} ms")
+            self.worker.process_violations(self.app, reader=self.reader, shard=(index, self.workers))
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"[SUPERVISOR] Worker {index} crashed: {e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        self.preload()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index, started = self.children.pop(pid, (None, None))
+            if index is None or self.stopping:
+                continue
+            lived = time.time() - started
+            print(f"[SUPERVISOR] Worker {index} (pid {pid}) exited with status {status} after {lived:.0f}s, replacing")
+            if lived < MIN_CHILD_LIFETIME:
+                time.sleep(RESPAWN_BACKOFF)
+            self.spawn(index)
+        print("[SUPERVISOR] All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run OCR workers forked from one preloaded parent")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ANPR_WORKERS', 2)))
+    parser.add_argument('--recognizer', choices=['easyocr', 'crnn'], help="Default: ANPR_RECOGNIZER or easyocr")
+    parser.add_argument('--torch-threads', type=int, default=1, help="Intra-op threads per child")
+    args = parser.parse_args()
+    Supervisor(args.workers, args.recognizer, args.torch_threads).run()
+
+
+if __name__ == "__main__":
+    main()
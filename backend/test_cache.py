@@ -0,0 +1,112 @@
+import os
+import tempfile
+from datetime import datetime
+
+from flask import Flask, jsonify, request
+
+import events
+from models import db, Violation
+from response_cache import ResponseCache, MemoryBackend, SqliteBackend, bump_version
+
+def cache_app(backend):
+    """
+    Flask app on a throwaway SQLite file with one cached view per dependency,
+    shaped like the dashboard endpoints in app.py.
+    """
+    app = Flask(__name__)
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='cache_test_')
+    os.close(fd)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    cache = ResponseCache(backend)
+    calls = {'challans': 0, 'cameras': 0}
+    principal = lambda: 'admin' if request.headers.get('Authorization') == 'admin' else None
+
+    @app.route('/challans')
+    @cache.cached(ttl=600, depends=('violations',), principal=principal)
+    def challans():
+        if principal() is None:
+            return jsonify({"error": "Unauthorized"}), 401
+        calls['challans'] += 1
+        return jsonify([{"id": v.id, "status": v.status} for v in Violation.query.order_by(Violation.id).all()]), 200
+
+    @app.route('/cameras')
+    @cache.cached(ttl=600, depends=('cameras',), principal=principal)
+    def cameras():
+        calls['cameras'] += 1
+        return jsonify({"calls": calls['cameras']}), 200
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Violation(vehicle_number="MH12AB1234", violation_type="Speeding", location="Test Road",
+                                 fine_amount=1000.0, image_path="test.jpg", status="processed"))
+        db.session.commit()
+    return app, path, calls
+
+def pay(app):
+    """What /api/user/pay-challan commits: the status change and its event."""
+    with app.app_context():
+        challan = Violation.query.first()
+        challan.status = 'paid'
+        challan.payment_date = datetime.utcnow()
+        events.record_event(challan, 'paid')
+        db.session.commit()
+
+def check_cache(backend):
+    app, path, calls = cache_app(backend)
+    admin = {"Authorization": "admin"}
+    try:
+        client = app.test_client()
+        first = client.get('/challans', headers=admin)
+        second = client.get('/challans', headers=admin)
+        etag = first.headers.get('ETag')
+        print(f"First: {first.headers.get('X-Cache')}, repeat: {second.headers.get('X-Cache')}, ETag: {etag}")
+        assert first.status_code == 200 and first.headers.get('X-Cache') == 'MISS'
+        assert second.headers.get('X-Cache') == 'HIT' and second.get_data() == first.get_data()
+        assert calls['challans'] == 1
+
+        revalidated = client.get('/challans', headers={**admin, "If-None-Match": etag})
+        print(f"If-None-Match: {revalidated.status_code}, body {len(revalidated.get_data())} bytes")
+        assert revalidated.status_code == 304 and not revalidated.get_data()
+
+        # Callers the view rejects are never served from, or stored in, the cache
+        assert client.get('/challans').status_code == 401
+
+        pay(app)
+        after = client.get('/challans', headers=admin)
+        print(f"After payment: {after.headers.get('X-Cache')}, {after.get_json()}")
+        assert after.headers.get('X-Cache') == 'MISS' and after.get_json()[0]["status"] == 'paid'
+        assert after.headers.get('ETag') != etag
+        assert client.get('/challans', headers={**admin, "If-None-Match": etag}).status_code == 200
+
+        # Other scopes move with bump_version()
+        client.get('/cameras', headers=admin)
+        assert client.get('/cameras', headers=admin).headers.get('X-Cache') == 'HIT'
+        with app.app_context():
+            bump_version('cameras')
+            db.session.commit()
+        assert client.get('/cameras', headers=admin).get_json() == {"calls": 2}
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(path)
+
+def test_memory_cache():
+    print("Testing response cache (memory): HIT/MISS, 304, invalidation after payment...")
+    check_cache(MemoryBackend())
+
+def test_sqlite_cache():
+    print("Testing response cache (sqlite): HIT/MISS, 304, invalidation after payment...")
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='response_cache_test_')
+    os.close(fd)
+    try:
+        check_cache(SqliteBackend(path))
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+if __name__ == "__main__":
+    test_memory_cache()
+    test_sqlite_cache()
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fake_notify_server import FakeSmsGateway, FakeSmtpServer
+from notifications import (SmsSender, EmailSender, Outgoing, NotificationDispatcher,
+                           enqueue_for_violation, MAX_ATTEMPTS)
+
+SMS_PORT = 18026
+SMTP_PORT = 11025
+SMS_URL = f"http://127.0.0.1:{SMS_PORT}/sms/batch"
+
+_fakes = {}
+
+def fakes():
+    """Starts the fake SMS gateway and SMTP server once for the whole run."""
+    if not _fakes:
+        _fakes['gateway'] = FakeSmsGateway(SMS_PORT).start()
+        _fakes['smtp'] = FakeSmtpServer(SMTP_PORT).start()
+    return _fakes['gateway'], _fakes['smtp']
+
+def messages(n, prefix):
+    return [Outgoing(i, f"{prefix}{i}", "e-Challan test", f"Test message {i}") for i in range(1, n + 1)]
+
+def test_sms_batch():
+    print("Testing SMS batch...")
+    gateway, _ = fakes()
+    sender = SmsSender(url=SMS_URL, rate=100)
+    results = asyncio.run(sender.send_batch(messages(20, "98765")))
+    failed = [i for i, error in results.items() if error]
+    print(f"Sent: {len(results) - len(failed)}, Failed: {len(failed)}, Gateway requests: {gateway.requests}")
+
+def test_email_batch():
+    print("Testing Email batch over one SMTP session...")
+    _, smtp = fakes()
+    sender = EmailSender(host='127.0.0.1', port=SMTP_PORT, rate=100)
+    results = asyncio.run(sender.send_batch(messages(10, "owner@example.com#")))
+    print(f"Sent: {sum(1 for e in results.values() if e is None)}, Received: {len(smtp.messages)}, Sessions: {smtp.sessions}")
+
+def test_rate_limit():
+    print("Testing rate limit (20 SMS at 10/s)...")
+    fakes()
+    sender = SmsSender(url=SMS_URL, rate=10)
+    start = time.time()
+    asyncio.run(sender.send_batch(messages(20, "91234")))
+    print(f"Elapsed: {time.time() - start:.2f}s (expected about 1s)")
+
+def test_failures():
+    print("Testing gateway rejections...")
+    gateway, _ = fakes()
+    gateway.fail_rate = 1.0
+    sender = SmsSender(url=SMS_URL, rate=100)
+    results = asyncio.run(sender.send_batch(messages(5, "90000")))
+    print(f"Errors: {sorted(set(results.values()))}")
+    gateway.fail_rate = 0.0
+
+def test_gateway_down():
+    print("Testing unreachable gateway...")
+    sender = SmsSender(url="http://127.0.0.1:1/sms/batch", rate=100)
+    results = asyncio.run(sender.send_batch(messages(3, "90000")))
+    print(f"All failed: {all(results.values())}")
+
+def outbox_app():
+    """Flask app on a throwaway SQLite file, so the dispatcher run never touches echallan.db."""
+    from flask import Flask
+    from models import db, User, Vehicle, Violation
+    app = Flask(__name__)
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='outbox_test_')
+    os.close(fd)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Vehicle(vehicle_number="MH12AB1234", owner_name="Test Owner", vehicle_model="Test",
+                               vehicle_type="Car", contact_number="9876500000",
+                               registration_date=datetime.utcnow().date()))
+        db.session.add(User(first_name="Test", last_name="Owner", email="owner@example.com", password="x",
+                            phone_number="9876500000", vehicle_number="MH12AB1234"))
+        db.session.add(Violation(vehicle_number="MH12AB1234", violation_type="Speeding", location="Test Road",
+                                 fine_amount=2000.0, image_path="test.jpg", status="processed"))
+        db.session.commit()
+    return app, path
+
+def test_dispatcher():
+    print("Testing outbox dispatcher: dedup, claim, retry/backoff, dead-letter, recovery...")
+    from models import db, Violation, NotificationOutbox
+    gateway, smtp = fakes()
+    app, path = outbox_app()
+    dispatcher = NotificationDispatcher(app, [SmsSender(url=SMS_URL, rate=100),
+                                              EmailSender(host='127.0.0.1', port=SMTP_PORT, rate=100)])
+    try:
+        with app.app_context():
+            violation = Violation.query.first()
+            added = enqueue_for_violation(violation)
+            db.session.commit()
+            again = enqueue_for_violation(violation)
+            db.session.commit()
+            print(f"Enqueued: {added} (sms + email), re-enqueued: {again} (expected 0)")
+            assert added == 2 and again == 0
+
+        # Retry with backoff: every SMS is rejected, the email goes through
+        gateway.fail_rate = 1.0
+        received = len(smtp.messages)
+        sent = asyncio.run(dispatcher.run_once())
+        with app.app_context():
+            sms = NotificationOutbox.query.filter_by(channel='sms').one()
+            email = NotificationOutbox.query.filter_by(channel='email').one()
+            print(f"Claimed: {sent}, sms: {sms.status} attempt {sms.attempts} ({sms.last_error}), "
+                  f"retry in {(sms.next_attempt_at - datetime.utcnow()).total_seconds():.0f}s, email: {email.status}")
+            assert sms.status == 'pending' and sms.attempts == 1 and sms.next_attempt_at > datetime.utcnow()
+            assert email.status == 'sent' and len(smtp.messages) == received + 1
+        print(f"Claimed again before backoff: {asyncio.run(dispatcher.run_once())} (expected 0)")
+
+        # Dead-letter: the last allowed attempt fails too
+        with app.app_context():
+            sms = NotificationOutbox.query.filter_by(channel='sms').one()
+            sms.attempts = MAX_ATTEMPTS - 1
+            sms.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+        asyncio.run(dispatcher.run_once())
+        with app.app_context():
+            sms = NotificationOutbox.query.filter_by(channel='sms').one()
+            print(f"After attempt {sms.attempts}: {sms.status}")
+            assert sms.status == 'dead'
+
+        # Crash recovery: a row stuck in 'sending' is retried and delivered
+        gateway.fail_rate = 0.0
+        with app.app_context():
+            sms = NotificationOutbox.query.filter_by(channel='sms').one()
+            sms.status, sms.attempts = 'sending', 1
+            sms.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+        dispatcher.recover()
+        asyncio.run(dispatcher.run_once())
+        with app.app_context():
+            sms = NotificationOutbox.query.filter_by(channel='sms').one()
+            print(f"Recovered row: {sms.status}")
+            assert sms.status == 'sent'
+    finally:
+        gateway.fail_rate = 0.0
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(path)
+
+if __name__ == "__main__":
+    test_sms_batch()
+    test_email_batch()
+    test_rate_limit()
+    test_failures()
+    test_gateway_down()
+    test_dispatcher()
@@ -0,0 +1,278 @@
+import os
+import shutil
+import subprocess
+import threading
+import queue
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+
+
+class CodecSettings:
+    """
+    Encoder configuration for evidence clips.
+
+    backend='ffmpeg_pipe' streams raw frames to an ffmpeg subprocess, so the
+    compression work happens outside this process and never holds the GIL.
+    backend='opencv' uses cv2.VideoWriter through OpenCV's FFmpeg backend.
+    """
+    def __init__(self, codec='h264', backend='ffmpeg_pipe', encoder=None,
+                 threads=2, preset='veryfast', crf=28, fps=20.0):
+        self.codec = codec
+        self.backend = backend
+        # Explicit ffmpeg encoder, e.g. h264_nvenc / h264_qsv / h264_vaapi for hardware encode
+        self.encoder = encoder
+        self.threads = threads
+        self.preset = preset
+        self.crf = crf
+        self.fps = fps
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            codec=os.environ.get('ANPR_VIDEO_CODEC', 'h264'),
+            backend=os.environ.get('ANPR_VIDEO_BACKEND', 'ffmpeg_pipe'),
+            encoder=os.environ.get('ANPR_VIDEO_ENCODER') or None,
+            threads=int(os.environ.get('ANPR_VIDEO_THREADS', 2)),
+            preset=os.environ.get('ANPR_VIDEO_PRESET', 'veryfast'),
+            crf=int(os.environ.get('ANPR_VIDEO_CRF', 28)),
+            fps=float(os.environ.get('ANPR_VIDEO_FPS', 20.0)),
+        )
+
+    def describe(self):
+        return f"{self.backend}:{self.encoder or self.codec} threads={self.threads} preset={self.preset} crf={self.crf}"
+
+
+class CaptureSettings:
+    """
+    Decoder configuration for camera streams.
+
+    buffer_size keeps the driver queue short so frames are fresh, decode_threads
+    is passed to FFmpeg, and threaded=True moves decoding onto its own thread
+    so detection never waits on the network or the decoder. read_timeout
+    (seconds) makes a stalled network stream fail the read instead of
+    blocking it forever, where the OpenCV build supports it.
+    """
+    def __init__(self, buffer_size=2, decode_threads=2, threaded=True, queue_size=64, read_timeout=10):
+        self.buffer_size = buffer_size
+        self.decode_threads = decode_threads
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self.read_timeout = read_timeout
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            buffer_size=int(os.environ.get('ANPR_CAPTURE_BUFFER', 2)),
+            decode_threads=int(os.environ.get('ANPR_DECODE_THREADS', 2)),
+            threaded=os.environ.get('ANPR_CAPTURE_THREADED', '1') == '1',
+            read_timeout=float(os.environ.get('ANPR_CAPTURE_TIMEOUT', 10)),
+        )
+
+
+# ============================
+# ENCODING
+# ============================
+
+_OPENCV_FOURCC = {'h264': 'avc1', 'mp4v': 'mp4v', 'mjpg': 'MJPG'}
+_FFMPEG_ENCODER = {'h264': 'libx264', 'mp4v': 'mpeg4', 'mjpg': 'mjpeg'}
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+class FFmpegPipeWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter that pipes BGR frames to ffmpeg.
+
+    If ffmpeg exits at startup (e.g. an encoder this build lacks) or the pipe
+    breaks mid-clip, the remaining frames go to an OpenCV writer on the same
+    file instead of failing the recording.
+    """
+    STARTUP_CHECK = 0.3 # seconds to watch ffmpeg after the first frame
+
+    def __init__(self, output_file, fps, frame_size, settings):
+        width, height = frame_size
+        self.output_file = output_file
+        self.fps = fps
+        self.frame_size = frame_size
+        self.settings = settings
+        self.fallback = None
+        self.started = False
+        encoder = settings.encoder or _FFMPEG_ENCODER.get(settings.codec, 'libx264')
+        cmd = [
+            'ffmpeg', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}", '-r', str(fps),
+            '-i', '-',
+            '-c:v', encoder, '-threads', str(settings.threads),
+        ]
+        if encoder == 'libx264':
+            cmd += ['-preset', settings.preset, '-crf', str(settings.crf)]
+        # yuv420p + faststart keeps the clip playable in browsers straight from the API
+        cmd += ['-pix_fmt', 'yuv420p', '-movflags', '+faststart', output_file]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def isOpened(self):
+        if self.fallback is not None:
+            return self.fallback.isOpened()
+        return self.proc.poll() is None
+
+    def _fall_back(self, reason):
+        print(f"[WARNING] ffmpeg encoder failed ({reason}), falling back to OpenCV encoder.")
+        self._close_pipe()
+        self.fallback = _open_opencv_writer(self.output_file, self.frame_size, self.settings, self.fps)
+
+    def write(self, frame):
+        if self.fallback is not None:
+            self.fallback.write(frame)
+            return
+        try:
+            # The pipe write releases the GIL; encoding happens in the ffmpeg process
+            self.proc.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError) as e:
+            self._fall_back(e)
+            self.fallback.write(frame)
+            return
+        if not self.started:
+            self.started = True
+            try:
+                code = self.proc.wait(timeout=self.STARTUP_CHECK)
+            except subprocess.TimeoutExpired:
+                return # still running: the encoder accepted the stream
+            self._fall_back(f"exited with code {code}")
+            self.fallback.write(frame)
+
+    def _close_pipe(self):
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        return self.proc.wait()
+
+    def release(self):
+        if self.fallback is not None:
+            self.fallback.release()
+            return
+        code = self._close_pipe()
+        if code != 0:
+            print(f"[WARNING] ffmpeg exited with code {code} while finishing {self.output_file}")
+
+
+def _open_opencv_writer(output_file, frame_size, settings, fps):
+    fourcc = cv2.VideoWriter_fourcc(*_OPENCV_FOURCC.get(settings.codec, 'mp4v'))
+    writer = cv2.VideoWriter(output_file, cv2.CAP_FFMPEG, fourcc, fps, frame_size)
+    if not writer.isOpened() and settings.codec != 'mp4v':
+        # Many pip OpenCV builds ship without an H.264 encoder
+        print(f"[WARNING] OpenCV cannot encode {settings.codec}, using mp4v.")
+        writer = cv2.VideoWriter(output_file, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+    return writer
+
+
+def open_writer(output_file, frame_size, settings=None, fps=None):
+    settings = settings or CodecSettings.from_env()
+    fps = fps or settings.fps
+    if settings.backend == 'ffmpeg_pipe':
+        if ffmpeg_available():
+            return FFmpegPipeWriter(output_file, fps, frame_size, settings)
+        print("[WARNING] ffmpeg binary not found, falling back to OpenCV encoder.")
+    return _open_opencv_writer(output_file, frame_size, settings, fps)
+
+
+# ============================
+# DECODING
+# ============================
+
+class ThreadedCapture:
+    """
+    Wraps cv2.VideoCapture with a background decode thread. Frames go into a
+    bounded queue; when the consumer falls behind, the oldest frame is dropped
+    so the stream never lags further and further behind real time. With
+    drop_oldest=False (set while recording evidence) the decode thread waits
+    for room instead, so no frame is lost.
+    """
+    def __init__(self, cap, queue_size=64, drop_oldest=True):
+        self.cap = cap
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.drop_oldest = drop_oldest
+        self.stopped = False
+        self.released = False
+        self.thread = threading.Thread(target=self._run, name="capture-decode", daemon=True)
+        self.thread.start()
+
+    def _push(self, item):
+        while True:
+            if self.drop_oldest and self.frames.full():
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+            try:
+                self.frames.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.stopped:
+                    return # released while waiting for the consumer
+
+    def _run(self):
+        while not self.stopped:
+            ret, frame = self.cap.read()
+            if not ret:
+                self._push((False, None))
+                self.stopped = True
+                break
+            self._push((True, frame))
+        if self.released:
+            # release() gave up waiting while this thread was stuck in a read
+            self.cap.release()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, timeout=5.0):
+        try:
+            return self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.released = True
+        self.stopped = True
+        self.thread.join(timeout=2)
+        if not self.thread.is_alive():
+            self.cap.release()
+
+
+def open_capture(source, settings=None):
+    settings = settings or CaptureSettings.from_env()
+
+    if isinstance(source, int):
+        # Local webcam index: FFmpeg options do not apply
+        cap = cv2.VideoCapture(source)
+    else:
+        # Must be set before the capture is opened; OpenCV reads it on open
+        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = f"threads;{settings.decode_threads}"
+        if settings.read_timeout and hasattr(cv2, 'CAP_PROP_READ_TIMEOUT_MSEC'):
+            timeout_ms = int(settings.read_timeout * 1000)
+            cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+                                                            cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+        else:
+            cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+
+    if cap.isOpened():
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size)
+        if settings.threaded:
+            return ThreadedCapture(cap, settings.queue_size)
+    return cap
@@ -1,40 +1,45 @@
 import time
 import os
-import cv2
-import easyocr
-import imutils
-import numpy as np
 import re
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Violation, Vehicle, db, create_app # Import app factory
+import json
+from datetime import datetime, timedelta, timezone
+from lazy_imports import lazy_import
+from models import Violation, Vehicle, CameraSegment, SIGHTING_STATUS, db, create_app # Import app factory
+from media import MediaPipeline
+from events import record_event
+from notifications import enqueue_for_violation
+from recognizers import get_recognizer
+from preprocess import get_preprocessor
+from speed import SectionSpeedEngine, segments_from_rows, speed_fine
+import storage
+from metrics import (timed, profile_job, instrument_engine, start_exporter,
+                     QUEUE_DEPTH, WORKER_BUSY, WORKER_IDLE, JOBS)
+from scheduler import PipelineScheduler, Job, PRIORITY_CLASSES, MAX_QUEUED, DEFAULT_CLASS
+
+cv2 = lazy_import('cv2')
 
 # Function to extract plate text
-def extract_plate_text(image_path, reader):
+def extract_plate_text(image_path, reader, full_frame_ocr=True, max_width=None):
+    """
+    full_frame_ocr=False only OCRs the contour-located region (skipping the
+    whole-image fallback) and max_width downscales before detection; the
+    scheduler turns these on when the live queue is falling behind.
+    Returns the plate-like reads, or None when the image can't be loaded.
+    """
     print(f"Processing: {image_path}")
-    img = cv2.imread(image_path)
+    with timed('capture'):
+        img = cv2.imread(storage.resolve_path(image_path))
     if img is None:
-        return None, "Image Load Failed"
-    
-    # 1. Grayscale & Blur
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    bfilter = cv2.bilateralFilter(gray, 11, 17, 17) # Noise reduction
+        print("Image Load Failed")
+        return None
+    if max_width and img.shape[1] > max_width:
+        h, w = img.shape[:2]
+        img = cv2.resize(img, (max_width, int(h * max_width / float(w))), interpolation=cv2.INTER_AREA)
     
-    # 2. Edge Detection
-    edged = cv2.Canny(bfilter, 30, 200)
+    with timed('detect'):
+        # Grayscale (+ CLAHE at night), denoise, edges and plate contour; see preprocess.py
+        gray, location = get_preprocessor().run_one(img)
 
-    # 3. Find Contours
-    keypoints = cv2.findContours(edged.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    contours = imutils.grab_contours(keypoints)
-    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:10]
-    
-    location = None
-    for contour in contours:
-        approx = cv2.approxPolyDP(contour, 10, True)
-        if len(approx) == 4:
-            location = approx
-            break
-            
     # 4. Masking (Optional, for now directly OCR on crop)
     plate_text = ""
     start_time = time.time()
@@ -43,7 +48,16 @@ def extract_plate_text(image_path, reader):
     # For better results in this "demo" without a strict model, we try to read the whole image 
     # but EasyOCR is slow on large images. Let's try to detect text.
     
-    result = reader.readtext(gray)
+    offset_x, offset_y = 0, 0
+    with timed('ocr'):
+        # Line recognizers (CRNN) can only read a localized plate, never the whole frame
+        if full_frame_ocr and not reader.needs_crop:
+            result = reader.readtext(gray)
+        elif location is not None:
+            offset_x, offset_y, w, h = cv2.boundingRect(location)
+            result = reader.readtext(gray[offset_y:offset_y + h, offset_x:offset_x + w])
+        else:
+            result = [] # Degraded mode: no plate contour, no full-frame fallback
     
     detected_text = []
     for (bbox, text, prob) in result:
@@ -51,91 +65,241 @@ def extract_plate_text(image_path, reader):
         clean_text = re.sub(r'[^A-Z0-9]', '', text.upper())
         if len(clean_text) > 4:
              detected_text.append(clean_text)
-             # Draw box on image (visual proof)
-             (top_left, top_right, bottom_right, bottom_left) = bbox
-             top_left = tuple(map(int, top_left))
-             bottom_right = tuple(map(int, bottom_right))
-             cv2.rectangle(img, top_left, bottom_right, (0, 255, 0), 2)
-             cv2.putText(img, text, (top_left[0], top_left[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-    # Save processed image with boxes
-    processed_path = image_path.replace("uploads", "processed_uploads")
-    if not os.path.exists(os.path.dirname(processed_path)):
-        os.makedirs(os.path.dirname(processed_path))
-        
-    cv2.imwrite(processed_path, img)
+
+    # No boxed copy is stored: no violation column references one, so it would
+    # only sit in the blob store unreferenced until the compactor purged it
+    return detected_text
+
+SEGMENT_RELOAD_INTERVAL = 60 # seconds between re-reading CameraSegment rows
+
+def _epoch(dt):
+    # Timestamps are stored as naive UTC
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+def load_speed_engine(engine=None):
+    segments = segments_from_rows(CameraSegment.query.filter_by(active=True).all())
+    if engine is not None:
+        engine.load(segments)
+        return engine
+    engine = SectionSpeedEngine(segments)
+    # Rebuild the sighting windows from recent rows so a restart doesn't lose in-flight vehicles
+    if engine.window_for:
+        horizon = datetime.utcnow() - timedelta(seconds=max(engine.window_for.values()))
+        recent = Violation.query.filter(
+            Violation.camera_id.isnot(None),
+            db.func.coalesce(Violation.captured_at, Violation.timestamp) >= horizon,
+            Violation.status.notin_(['pending', 'error'])
+        ).order_by(db.func.coalesce(Violation.captured_at, Violation.timestamp)).all()
+        for v in recent:
+            engine.observe(v.vehicle_number, v.camera_id, _epoch(v.captured_at or v.timestamp), ref=v.id)
+    return engine
+
+def apply_section_speed(violation, plate, matched_vehicle, speed_engine):
+    """
+    Feeds a sighting from a section camera into the average-speed engine and
+    classifies the row. Returns False when the camera is not part of any segment.
+    """
+    if violation.camera_id is None or not speed_engine.is_enforced(violation.camera_id):
+        return False
+
+    results = []
+    if plate != "UNKNOWN":
+        with timed('speed'):
+            seen_at = violation.captured_at or violation.timestamp
+            results = [r for r in speed_engine.observe(plate, violation.camera_id, _epoch(seen_at), ref=violation.id)
+                       if r.over_limit]
+
+    if results:
+        worst = max(results, key=lambda r: r.speed_kmph)
+        violation.violation_type = "Speeding"
+        violation.fine_amount = speed_fine(worst.speed_kmph, worst.segment.limit_kmph)
+        violation.evidence = json.dumps(worst.evidence())
+        violation.status = "processed" if matched_vehicle else "needs_review"
+        violation.confidence_score = 0.95 if matched_vehicle else 0.0
+        print(f"Section speed {worst.speed_kmph:.1f} km/h (limit {worst.segment.limit_kmph}) for {plate}")
+    elif plate == "UNKNOWN":
+        violation.violation_type = "Unidentified"
+        violation.status = "needs_review"
+        violation.fine_amount = 0.0
+    else:
+        # Plain sighting: kept as the entry point for a later downstream match
+        violation.violation_type = "Sighting"
+        violation.status = SIGHTING_STATUS
+        violation.fine_amount = 0.0
+    return True
+
+def match_plate(detected_texts):
+    """Picks the read that matches a registered vehicle, else the first read."""
+    matched_vehicle = None
+    final_plate = "UNKNOWN"
     
-    return detected_text, processed_path
+    with timed('match'):
+        if detected_texts:
+            for text in detected_texts:
+                # Check database
+                v = Vehicle.query.filter_by(vehicle_number=text).first()
+                if v:
+                    matched_vehicle = v
+                    final_plate = text
+                    break
+            
+            if not matched_vehicle and detected_texts:
+                final_plate = detected_texts[0] # Pick first if no match
+    return final_plate, matched_vehicle
+
+def classify_flagged(violation, final_plate, matched_vehicle):
+    """Classification for uploads from a camera outside any speed section."""
+    if matched_vehicle:
+        # The edge device flagged it
+        violation.violation_type = "Speeding" # Mock classification
+        violation.fine_amount = 2000.0
+        violation.status = "processed"
+        violation.confidence_score = 0.95
+        print(f"Matched Vehicle: {final_plate}")
+    else:
+        violation.violation_type = "Unidentified"
+        violation.status = "needs_review"
+        violation.fine_amount = 0.0
+        print(f"Could not match vehicle definitively. Read: {final_plate}")
 
-def process_violations(app):
-    print("Initializing EasyOCR...")
-    reader = easyocr.Reader(['en'], gpu=False) # CPU for compatibility
+def process_violation(violation, reader, speed_engine, options=None):
+    """
+    Runs OCR + vehicle matching for one violation and commits the result.
+    `options` are the scheduler's degradation settings for extract_plate_text.
+    """
+    # Perform Processing
+    detected_texts = extract_plate_text(violation.image_path, reader, **(options or {}))
+    
+    # Logic to match vehicle
+    final_plate, matched_vehicle = match_plate(detected_texts)
+    
+    # Update Record
+    violation.vehicle_number = final_plate
+    # For this scope, let's just update status
+    
+    if apply_section_speed(violation, final_plate, matched_vehicle, speed_engine):
+        print(f"Section camera {violation.camera_id}: {violation.violation_type} ({final_plate})")
+    else:
+        classify_flagged(violation, final_plate, matched_vehicle)
+
+    with timed('commit'):
+        record_event(violation, violation.status)
+        if violation.status == "processed":
+            # Outbox rows only; the notification dispatcher does the sending
+            enqueue_for_violation(violation, matched_vehicle)
+        db.session.commit()
+
+POLL_INTERVAL = 2      # seconds between looks at the DB for new work
+RESCAN_INTERVAL = 60   # full rescan picks up rows that were re-queued or rejected earlier
+
+def _pending_filter():
+    return (Violation.status == 'pending') | (Violation.violation_type == 'Processing...')
+
+def poll_pending(scheduler, cursors, shard=None, section_cameras=()):
+    """
+    Moves pending rows into the scheduler, per priority class, only as far as
+    each class queue has room. `cursors` holds the last id seen per class;
+    rows are fetched by id so none is skipped, and the scheduler orders them
+    by capture time. Rows from `section_cameras` share the scheduler's
+    capture-ordered section lane.
+    `shard` = (index, count) restricts this worker to ids with id % count == index.
+    Section-camera rows all go to shard 0 instead: pairing happens in that
+    process's SectionSpeedEngine, so both ends of a segment must meet there.
+    """
+    shard_filter = []
+    if shard:
+        section = Violation.camera_id.in_(section_cameras)
+        own = Violation.id % shard[1] == shard[0]
+        if shard[0] == 0:
+            shard_filter = [section | own]
+        else:
+            shard_filter = [own, Violation.camera_id.is_(None) | Violation.camera_id.notin_(section_cameras)]
+    for priority_class in PRIORITY_CLASSES:
+        room = MAX_QUEUED[priority_class] - scheduler.counts[priority_class]
+        if room <= 0:
+            continue
+        rows = db.session.query(
+            Violation.id, Violation.camera_id,
+            db.func.coalesce(Violation.captured_at, Violation.timestamp)
+        ).filter(
+            _pending_filter(),
+            db.func.coalesce(Violation.priority_class, DEFAULT_CLASS) == priority_class,
+            Violation.id > cursors[priority_class],
+            *shard_filter
+        ).order_by(Violation.id).limit(room).all()
+        for violation_id, camera_id, created in rows:
+            job = Job(violation_id, priority_class, camera_id, _epoch(created), section=camera_id in section_cameras)
+            if not scheduler.enqueue(job):
+                break
+            cursors[priority_class] = violation_id
+
+def process_violations(app, reader=None, shard=None):
+    """
+    Main worker loop. `reader` may be passed in already loaded (see
+    supervisor.py); `shard` splits the pending rows between several workers.
+    """
+    reader = reader or get_recognizer() # ANPR_RECOGNIZER=easyocr|crnn, CPU for compatibility
+    media_pipeline = MediaPipeline() # Thumbnails/posters are built off the OCR thread
+    scheduler = PipelineScheduler()
+    with app.app_context():
+        instrument_engine(db.engine)
+    start_exporter(f"worker-{os.getpid()}")
+    with app.app_context():
+        speed_engine = load_speed_engine()
+    segments_loaded_at = time.time()
+    cursors = {c: 0 for c in PRIORITY_CLASSES}
+    rescanned_at = time.time()
     print("Worker Started. Waiting for violations...")
 
     while True:
         with app.app_context():
-            # Find Pending Violations
-            pending = Violation.query.filter(
-                (Violation.status == 'pending') | (Violation.violation_type == 'Processing...')
-            ).all()
+            if time.time() - segments_loaded_at > SEGMENT_RELOAD_INTERVAL:
+                load_speed_engine(speed_engine)
+                segments_loaded_at = time.time()
+            if time.time() - rescanned_at > RESCAN_INTERVAL:
+                cursors = {c: 0 for c in PRIORITY_CLASSES}
+                rescanned_at = time.time()
 
-            if not pending:
-                time.sleep(2)
+            poll_pending(scheduler, cursors, shard, speed_engine.cameras())
+            QUEUE_DEPTH.set(len(scheduler))
+            scheduler.export_metrics()
+
+            if not len(scheduler):
+                time.sleep(POLL_INTERVAL)
+                WORKER_IDLE.inc(POLL_INTERVAL)
                 continue
 
-            for violation in pending:
-                print(f"Found Violation ID: {violation.id}")
+            busy_start = time.perf_counter()
+            # Work until the next poll so newly arrived live jobs can jump the queue
+            poll_deadline = time.time() + POLL_INTERVAL
+            while time.time() < poll_deadline:
+                job = scheduler.next()
+                if job is None:
+                    if not len(scheduler):
+                        break
+                    time.sleep(0.2) # only section jobs inside their hold window are left
+                    continue
+                violation = db.session.get(Violation, job.violation_id)
+                if violation is None or not (violation.status == 'pending' or violation.violation_type == 'Processing...'):
+                    continue
+                level, options = scheduler.processing_options()
+                print(f"Found Violation ID: {violation.id} [{job.priority_class}, degrade={level}]")
                 
                 try:
-                    # Perform Processing
-                    detected_texts, processed_img_path = extract_plate_text(violation.image_path, reader)
-                    
-                    # Logic to match vehicle
-                    matched_vehicle = None
-                    final_plate = "UNKNOWN"
-                    
-                    if detected_texts:
-                        for text in detected_texts:
-                            # Check database
-                            v = Vehicle.query.filter_by(vehicle_number=text).first()
-                            if v:
-                                matched_vehicle = v
-                                final_plate = text
-                                break
-                        
-                        if not matched_vehicle and detected_texts:
-                            final_plate = detected_texts[0] # Pick first if no match
-                            
-                    # Update Record
-                    violation.vehicle_number = final_plate
-                    # violation.image_path = processed_img_path # Point to processed image? Or keep original? Let's keep original for evidence, maybe store processed separately
-                    # For this scope, let's just update status
-                    
-                    if matched_vehicle:
-                        violation.violation_type = "Speeding" # Mock classification
-                        violation.fine_amount = 2000.0
-                        violation.status = "processed"
-                        violation.confidence_score = 0.95
-                        print(f"Matched Vehicle: {final_plate}")
-                    else:
-                        violation.violation_type = "Unidentified"
-                        violation.status = "needs_review"
-                        violation.fine_amount = 0.0
-                        print(f"Could not match vehicle definitively. Read: {final_plate}")
-
-                    db.session.commit()
+                    with timed('total', priority_class=job.priority_class), profile_job(f"violation-{violation.id}"):
+                        process_violation(violation, reader, speed_engine, options)
+                    JOBS.inc(outcome=violation.status)
+                    media_pipeline.submit_violation(violation)
                     
                 except Exception as e:
                     print(f"Error processing {violation.id}: {e}")
+                    JOBS.inc(outcome="error")
+                    db.session.rollback()
                     violation.status = "error"
+                    record_event(violation, 'error')
                     db.session.commit()
-
-        time.sleep(1)
+            WORKER_BUSY.inc(time.perf_counter() - busy_start)
 
 if __name__ == "__main__":
     app = create_app()
-    # Ensure processed folder exists
-    if not os.path.exists('processed_uploads'):
-        os.makedirs('processed_uploads')
-        
     process_violations(app)
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { FileText, Search, Filter, Eye, Download, X, Calendar, MapPin, Clock, CreditCard, User, Car } from 'lucide-react';
-import api from '../../utils/api';
+import api, { mediaUrl } from '../../utils/api';
 
 const Challans = () => {
     const [challans, setChallans] = useState([]);
@@ -161,7 +161,7 @@ const Challans = () => {
                             {/* Evidence View */}
                             <div className="flex-1 bg-black flex items-center justify-center relative group min-h-[300px]">
                                 <img
-                                    src={`http://localhost:5000/${selectedChallan.image}`}
+                                    src={mediaUrl(selectedChallan.image)}
                                     alt="Violation"
                                     className="max-w-full max-h-full object-contain"
                                 />
@@ -170,7 +170,7 @@ const Challans = () => {
                                 </div>
                                 <div className="absolute bottom-4 right-4 bg-black/60 px-4 py-2 rounded-xl border border-white/10 backdrop-blur-md">
                                     <p className="text-[10px] text-white/60 font-medium uppercase mb-1 leading-none">Cropped Plate</p>
-                                    <img src={`http://localhost:5000/${selectedChallan.plate_crop}`} alt="Plate" className="h-10 border border-white/20 rounded" />
+                                    <img src={mediaUrl(selectedChallan.plate_crop)} alt="Plate" className="h-10 border border-white/20 rounded" />
                                 </div>
                             </div>
 
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import { ArrowLeft, Wifi, MapPin, Minimize2, Cpu, BarChart, Settings, Share2, Camera } from 'lucide-react';
+import { ArrowLeft, Wifi, MapPin, Minimize2, Cpu, BarChart, Settings, Share2, Camera, Activity } from 'lucide-react';
 import api from '../../utils/api';
 
 const LiveStream = () => {
@@ -69,13 +69,21 @@ const LiveStream = () => {
                 {/* Main Viewport */}
                 <div className="xl:col-span-3 space-y-6">
                     <div className="relative aspect-video bg-black rounded-[40px] border border-slate-700 shadow-2xl overflow-hidden group">
-                        {/* Stream Mockup */}
-                        <div className="absolute inset-0 bg-gradient-to-br from-slate-900 via-black to-slate-900 flex items-center justify-center">
-                            <div className="text-center opacity-20">
-                                <Camera className="w-32 h-32 text-blue-500 mx-auto mb-4" />
-                                <p className="font-mono text-xl text-blue-400 tracking-[0.5em]">{streamData.stream_url}</p>
+                        {/* Relayed MJPEG preview (one backend decode shared by all viewers) */}
+                        {streamData.stream_url ? (
+                            <img
+                                src={`${streamData.stream_url}?token=${encodeURIComponent(JSON.parse(localStorage.getItem('challan_user'))?.token || '')}`}
+                                alt={`Camera ${id} live preview`}
+                                className="absolute inset-0 w-full h-full object-contain"
+                            />
+                        ) : (
+                            <div className="absolute inset-0 bg-gradient-to-br from-slate-900 via-black to-slate-900 flex items-center justify-center">
+                                <div className="text-center opacity-20">
+                                    <Camera className="w-32 h-32 text-blue-500 mx-auto mb-4" />
+                                    <p className="font-mono text-xl text-blue-400 tracking-[0.5em]">NO STREAM CONFIGURED</p>
+                                </div>
                             </div>
-                        </div>
+                        )}
 
                         {/* Overlay Controls */}
                         <div className="absolute top-8 left-8 flex flex-col gap-2">
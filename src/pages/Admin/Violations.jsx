@@ -10,21 +10,54 @@ const Violations = () => {
     const [violations, setViolations] = useState([]);
     const [loading, setLoading] = useState(true);
 
-    const fetchViolations = async () => {
-        try {
-            const response = await api.get('/api/violations');
-            setViolations(response.data);
-        } catch (error) {
-            console.error("Failed to fetch violations", error);
-        } finally {
-            setLoading(false);
-        }
-    };
-
     useEffect(() => {
-        fetchViolations();
-        const interval = setInterval(fetchViolations, 5000); // Auto-refresh every 5s for real-time updates
-        return () => clearInterval(interval);
+        let source = null;
+        let cancelled = false;
+
+        const applyEvent = (event) => {
+            const message = JSON.parse(event.data);
+            setViolations(prev => {
+                // Update the row in place, or prepend a newly created violation
+                if (prev.some(v => v.id === message.violation.id)) {
+                    return prev.map(v => v.id === message.violation.id ? message.violation : v);
+                }
+                return [message.violation, ...prev];
+            });
+        };
+
+        const connect = async () => {
+            try {
+                // One snapshot, then only deltas from the change feed
+                const response = await api.get('/api/admin/challans');
+                if (cancelled) return;
+                setViolations(response.data);
+
+                const user = JSON.parse(localStorage.getItem('challan_user'));
+                const params = new URLSearchParams({
+                    cursor: response.headers['x-event-cursor'] || '0',
+                    token: user?.token || '',
+                });
+                source = new EventSource(`${api.defaults.baseURL}/api/admin/events?${params}`);
+                ['created', 'processed', 'needs_review', 'error', 'paid'].forEach(kind =>
+                    source.addEventListener(kind, applyEvent)
+                );
+                // A section-camera pass under the limit is a sighting, not a challan
+                source.addEventListener('cleared', (event) => {
+                    const message = JSON.parse(event.data);
+                    setViolations(prev => prev.filter(v => v.id !== message.violation.id));
+                });
+            } catch (error) {
+                console.error("Failed to fetch violations", error);
+            } finally {
+                setLoading(false);
+            }
+        };
+
+        connect();
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+        };
     }, []);
 
     const filteredViolations = filter === 'all' ? violations : violations.filter(v => v.status === filter);
@@ -78,7 +111,7 @@ const Violations = () => {
                                 className="hover:bg-slate-700/30 transition-colors"
                             >
                                 <td className="p-4 font-medium text-white">#{v.id}</td>
-                                <td className="p-4 uppercase font-bold text-slate-200">{v.plate}</td>
+                                <td className="p-4 uppercase font-bold text-slate-200">{v.vehicle_number}</td>
                                 <td className="p-4">
                                     <span className={`px-2 py-1 rounded text-xs border ${v.type === 'Speeding' ? 'bg-red-500/10 text-red-400 border-red-500/20' :
                                             v.type === 'Red Light' ? 'bg-orange-500/10 text-orange-400 border-orange-500/20' :
@@ -92,7 +125,7 @@ const Violations = () => {
                                     <div className="text-white">{v.location}</div>
                                     <div className="text-xs text-slate-500">{v.timestamp}</div>
                                 </td>
-                                <td className="p-4 font-bold text-white">₹{v.fine || 0}</td>
+                                <td className="p-4 font-bold text-white">₹{v.amount || 0}</td>
                                 <td className="p-4">
                                     <span className={`px-2 py-1 rounded text-xs uppercase font-bold ${v.status === 'pending' ? 'bg-yellow-500/10 text-yellow-400' :
                                             v.status === 'processed' ? 'bg-emerald-500/10 text-emerald-400' :
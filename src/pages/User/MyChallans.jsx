@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { FileText, MapPin, Calendar, CreditCard, ChevronRight, X, Play, Eye, AlertCircle, CheckCircle } from 'lucide-react';
-import api from '../../utils/api';
+import api, { mediaUrl } from '../../utils/api';
 import { clsx } from 'clsx';
 import { twMerge } from 'tailwind-merge';
 
@@ -148,7 +148,7 @@ const MyChallans = () => {
                                 <div className="space-y-6">
                                     <div className="aspect-video bg-slate-100 rounded-2xl border border-slate-200 overflow-hidden relative group">
                                         <img
-                                            src={selectedChallan.image ? `http://localhost:5000/${selectedChallan.image}` : 'https://images.unsplash.com/photo-1544620347-c4fd4a3d5957?auto=format&fit=crop&q=80'}
+                                            src={selectedChallan.image ? mediaUrl(selectedChallan.image) : 'https://images.unsplash.com/photo-1544620347-c4fd4a3d5957?auto=format&fit=crop&q=80'}
                                             className="w-full h-full object-cover"
                                             alt="Violation"
                                         />
@@ -169,7 +169,7 @@ const MyChallans = () => {
                                         </div>
                                         <div className="bg-slate-50 p-4 rounded-2xl border border-slate-100 flex items-center justify-center">
                                             {selectedChallan.plate_crop ? (
-                                                <img src={`http://localhost:5000/${selectedChallan.plate_crop}`} className="h-full object-contain mix-blend-multiply" alt="Plate Crop" />
+                                                <img src={mediaUrl(selectedChallan.plate_crop)} className="h-full object-contain mix-blend-multiply" alt="Plate Crop" />
                                             ) : (
                                                 <div className="text-slate-400 text-xs italic">Plate Crop Pending</div>
                                             )}
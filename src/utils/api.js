@@ -17,4 +17,11 @@ api.interceptors.request.use((config) => {
     return config;
 });
 
+// <img>/<video> cannot send the auth headers, so evidence URLs carry them as query parameters
+export const mediaUrl = (path) => {
+    const user = JSON.parse(localStorage.getItem('challan_user'));
+    const params = new URLSearchParams({ token: user?.token || '', user_id: user?.id || '' });
+    return `http://localhost:5000/${path}?${params}`;
+};
+
 export default api;